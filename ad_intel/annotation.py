@@ -0,0 +1,407 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+DEFAULT_MODEL = 'gemini-2.5-flash'
+DEFAULT_BASE_URL = 'https://generativelanguage.googleapis.com'
+
+# field -> (JSON schema type, question)
+QUESTIONS: Dict[str, Tuple[str, str]] = {
+    'transcription': ('string', 'Transcribe the audio from this video, giving timestamps for salient events in the video. Also provide visual descriptions.'),
+    'video_length': ('number', 'What is the length of this video in seconds?'),
+    'music_theme': ('string', 'What is the theme of the music in this video? In one word.'),
+    'company_name': ('string', 'What is the name of the company in this video?'),
+    'company_industry': ('string', 'What is the industry of the company in this video? No brackets.'),
+    'call_to_action': ('string', 'What is the call to action in this video? No brackets.'),
+    'brand_logo': ('number', 'How long did the brand logo appear in the video, in seconds?'),
+    'cuts': ('integer', 'How many cuts were there in this video?'),
+    'product': ('string', 'What is the product in this video? No brackets.'),
+    'product_display_count': ('integer', 'How many times was the product displayed in this video?'),
+}
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def build_prompt() -> str:
+    lines = [
+        'Answer every question below about this video ad.',
+        'Reply with a single JSON object using exactly these keys; give only the value, no extra details.',
+    ]
+    for key, (_, question) in QUESTIONS.items():
+        lines.append(f"- {key}: {question}")
+    return '\n'.join(lines)
+
+
+def response_schema() -> Dict[str, Any]:
+    return {
+        'type': 'object',
+        'properties': {k: {'type': t} for k, (t, _) in QUESTIONS.items()},
+        'required': list(QUESTIONS),
+    }
+
+
+def prompt_fingerprint(model: str) -> str:
+    # Any edit to the questions, prompt wording or schema changes the cache key, no manual version bump
+    h = hashlib.sha256()
+    for part in (build_prompt(), json.dumps(response_schema(), sort_keys=True), model):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AnnotationHTTPError(RuntimeError):
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class GeminiRestClient:
+    """
+    Minimal blocking client for the Gemini Files + generateContent REST API.
+
+    Only the standard library is used so the same code talks to the real
+    service or to the local stub in ad_intel.annotation_stub.
+    """
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, base_url: str = DEFAULT_BASE_URL, timeout: float = 120.0):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _url(self, path: str) -> str:
+        sep = '&' if '?' in path else '?'
+        if path.startswith('http'):
+            return f"{path}{sep}key={urllib.parse.quote(self.api_key)}"
+        return f"{self.base_url}{path}{sep}key={urllib.parse.quote(self.api_key)}"
+
+    def _request(self, method: str, url: str, body: Optional[Any] = None, headers: Optional[Dict[str, str]] = None):
+        req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, dict(resp.headers), resp.read()
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get('Retry-After') if e.headers else None
+            try:
+                retry_after_sec = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after_sec = None
+            raise AnnotationHTTPError(e.code, e.read().decode('utf-8', 'replace')[:500], retry_after_sec) from None
+
+    def _json(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        _, _, raw = self._request(method, url, body, headers)
+        return json.loads(raw) if raw else {}
+
+    def upload(self, path: Path) -> Dict[str, Any]:
+        size = path.stat().st_size
+        mime = mimetypes.guess_type(path.name)[0] or 'video/mp4'
+        _, headers, _ = self._request(
+            'POST',
+            self._url('/upload/v1beta/files'),
+            json.dumps({'file': {'display_name': path.name}}).encode('utf-8'),
+            {
+                'Content-Type': 'application/json',
+                'X-Goog-Upload-Protocol': 'resumable',
+                'X-Goog-Upload-Command': 'start',
+                'X-Goog-Upload-Header-Content-Length': str(size),
+                'X-Goog-Upload-Header-Content-Type': mime,
+            },
+        )
+        upload_url = {k.lower(): v for k, v in headers.items()}.get('x-goog-upload-url')
+        if not upload_url:
+            raise RuntimeError('Upload session did not return an upload URL')
+        # Streamed from disk: urllib sends a file body in blocks when Content-Length is given
+        with open(path, 'rb') as f:
+            _, _, raw = self._request(
+                'POST',
+                upload_url,
+                f,
+                {
+                    'Content-Length': str(size),
+                    'X-Goog-Upload-Offset': '0',
+                    'X-Goog-Upload-Command': 'upload, finalize',
+                },
+            )
+        return json.loads(raw)['file']
+
+    def get_file(self, name: str) -> Dict[str, Any]:
+        return self._json('GET', self._url(f"/v1beta/{name}"))
+
+    def delete_file(self, name: str) -> None:
+        self._request('DELETE', self._url(f"/v1beta/{name}"))
+
+    def generate(self, file: Dict[str, Any], prompt: str, schema: Dict[str, Any]) -> Tuple[str, int]:
+        payload = {
+            'contents': [{
+                'role': 'user',
+                'parts': [
+                    {'fileData': {'mimeType': file.get('mimeType', 'video/mp4'), 'fileUri': file['uri']}},
+                    {'text': prompt},
+                ],
+            }],
+            'generationConfig': {'responseMimeType': 'application/json', 'responseSchema': schema},
+        }
+        out = self._json('POST', self._url(f"/v1beta/models/{self.model}:generateContent"), payload)
+        parts = out['candidates'][0]['content']['parts']
+        text = ''.join(p.get('text', '') for p in parts)
+        used = int(out.get('usageMetadata', {}).get('totalTokenCount', 0))
+        return text, used
+
+
+class _Bucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = float(per_minute)
+        self.stamp = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, n: float) -> float:
+        self._refill()
+        # Requests larger than the whole bucket go through once it is full
+        need = min(n, self.capacity)
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self, n: float) -> None:
+        self.tokens -= n
+
+
+class RateLimiter:
+    """Async token bucket over requests/minute and tokens/minute."""
+
+    def __init__(self, requests_per_minute: float = 60.0, tokens_per_minute: float = 1_000_000.0):
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, est_tokens: int) -> None:
+        async with self._lock:
+            while True:
+                delay = max(self._requests.wait_time(1), self._tokens.wait_time(est_tokens))
+                if delay <= 0:
+                    self._requests.take(1)
+                    self._tokens.take(est_tokens)
+                    return
+                await asyncio.sleep(delay)
+
+    def settle(self, est_tokens: int, used_tokens: int) -> None:
+        # Correct the estimate once the real usage is known; may go negative to throttle later calls
+        if used_tokens:
+            self._tokens.take(used_tokens - est_tokens)
+
+
+class AnnotationCache:
+    def __init__(self, root: Optional[Path]):
+        self.root = root
+        if root is not None:
+            root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(content_hash: str, model: str) -> str:
+        return hashlib.sha256(f"{content_hash}|{prompt_fingerprint(model)}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.root is None:
+            return None
+        p = self.root / f"{key}.json"
+        if not p.exists():
+            return None
+        try:
+            return json.loads(p.read_text())
+        except Exception:
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if self.root is None:
+            return
+        tmp = self.root / f".{key}.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(value))
+        os.replace(tmp, self.root / f"{key}.json")
+
+
+def parse_answers(text: str) -> Dict[str, Any]:
+    raw = json.loads(text)
+    if not isinstance(raw, dict):
+        raise ValueError('Model response is not a JSON object')
+    missing = [k for k in QUESTIONS if k not in raw]
+    if missing:
+        raise ValueError(f"Model response is missing required keys: {', '.join(missing)}")
+    out: Dict[str, Any] = {}
+    for key, (typ, _) in QUESTIONS.items():
+        val = raw.get(key)
+        try:
+            if typ == 'integer':
+                val = int(float(val)) if val not in (None, '') else None
+            elif typ == 'number':
+                val = float(val) if val not in (None, '') else None
+            else:
+                val = str(val).strip() if val is not None else ''
+        except (TypeError, ValueError):
+            val = None
+        out[key] = val
+    return out
+
+
+@dataclass
+class AnnotatorConfig:
+    concurrency: int = 8
+    requests_per_minute: float = 60.0
+    tokens_per_minute: float = 1_000_000.0
+    file_requests_per_minute: float = 600.0   # upload/poll/delete calls, limited separately from generate
+    est_tokens_per_video: int = 20_000
+    max_retries: int = 5
+    backoff_base: float = 1.0
+    poll_initial: float = 0.5
+    poll_max: float = 10.0
+    processing_timeout: float = 600.0
+
+
+async def _with_retries(fn, cfg: AnnotatorConfig, limiter: RateLimiter, est_tokens: int, *args):
+    # The limiter is acquired per attempt, so retries after a 429 wait for capacity too
+    attempt = 0
+    while True:
+        await limiter.acquire(est_tokens)
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except AnnotationHTTPError as e:
+            if e.status not in RETRY_STATUS or attempt >= cfg.max_retries:
+                raise
+            delay = e.retry_after if e.retry_after is not None else cfg.backoff_base * (2 ** attempt)
+        except (urllib.error.URLError, TimeoutError, ConnectionError):
+            if attempt >= cfg.max_retries:
+                raise
+            delay = cfg.backoff_base * (2 ** attempt)
+        await asyncio.sleep(delay * (1.0 + 0.25 * random.random()))
+        attempt += 1
+
+
+async def _wait_active(client: GeminiRestClient, file: Dict[str, Any], cfg: AnnotatorConfig, files: RateLimiter) -> Dict[str, Any]:
+    delay = cfg.poll_initial
+    deadline = time.monotonic() + cfg.processing_timeout
+    while file.get('state') == 'PROCESSING':
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"File {file.get('name')} still processing after {cfg.processing_timeout:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, cfg.poll_max)
+        file = await _with_retries(client.get_file, cfg, files, 0, file['name'])
+    if file.get('state') == 'FAILED':
+        raise RuntimeError(f"Video processing failed: {file.get('name')}")
+    return file
+
+
+async def annotate_one(
+    item: Dict[str, Any],
+    client: GeminiRestClient,
+    limiter: RateLimiter,
+    cache: AnnotationCache,
+    cfg: AnnotatorConfig,
+    files: Optional[RateLimiter] = None,
+) -> Dict[str, Any]:
+    files = files or RateLimiter(cfg.file_requests_per_minute)
+    row: Dict[str, Any] = {'id': item['id']}
+    path = Path(item['path'])
+    try:
+        key = cache.key(await asyncio.to_thread(file_sha256, path), client.model)
+        cached = cache.get(key)
+        if cached is not None:
+            row.update(cached)
+            return row
+
+        file = await _with_retries(client.upload, cfg, files, 0, path)
+        try:
+            file = await _wait_active(client, file, cfg, files)
+            prompt, schema = build_prompt(), response_schema()
+            attempt = 0
+            while True:
+                text, used = await _with_retries(client.generate, cfg, limiter, cfg.est_tokens_per_video, file, prompt, schema)
+                limiter.settle(cfg.est_tokens_per_video, used)
+                try:
+                    answers = parse_answers(text)
+                    break
+                except ValueError:
+                    # Malformed JSON from the model is retried like a transient error
+                    if attempt >= cfg.max_retries:
+                        raise
+                    attempt += 1
+        finally:
+            try:
+                await files.acquire(0)
+                await asyncio.to_thread(client.delete_file, file['name'])
+            except Exception:
+                pass
+
+        cache.put(key, answers)
+        row.update(answers)
+    except Exception as e:
+        row['llm_error'] = str(e)
+    return row
+
+
+async def annotate_videos_async(
+    items: List[Dict[str, Any]],
+    client: GeminiRestClient,
+    cache_dir: Optional[Path] = None,
+    config: Optional[AnnotatorConfig] = None,
+) -> List[Dict[str, Any]]:
+    cfg = config or AnnotatorConfig()
+    limiter = RateLimiter(cfg.requests_per_minute, cfg.tokens_per_minute)
+    files = RateLimiter(cfg.file_requests_per_minute)
+    cache = AnnotationCache(cache_dir)
+    sem = asyncio.Semaphore(max(cfg.concurrency, 1))
+
+    async def run(it: Dict[str, Any]) -> Dict[str, Any]:
+        async with sem:
+            return await annotate_one(it, client, limiter, cache, cfg, files)
+
+    return list(await asyncio.gather(*(run(it) for it in items)))
+
+
+def annotate_videos(
+    items: List[Dict[str, Any]],
+    client: GeminiRestClient,
+    cache_dir: Optional[Path] = None,
+    config: Optional[AnnotatorConfig] = None,
+) -> List[Dict[str, Any]]:
+    return asyncio.run(annotate_videos_async(items, client, cache_dir=cache_dir, config=config))
+
+
+def merge_annotations(df: pd.DataFrame, annotations: List[Dict[str, Any]]) -> pd.DataFrame:
+    if not annotations:
+        return df
+    ann = pd.DataFrame(annotations).set_index('id')
+    base = df.set_index('id')
+    ann = ann[ann.index.isin(base.index)]
+    # Annotated values win over the empty placeholder columns already in the table
+    for col in ann.columns:
+        base[col] = base[col].astype(object) if col in base.columns else pd.Series(None, index=base.index, dtype=object)
+        base.loc[ann.index, col] = ann[col]
+    return base.reset_index()
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from .annotation import QUESTIONS
+
+
+# Offline stand-in for the Gemini Files + generateContent endpoints used by
+# ad_intel.annotation. Files report PROCESSING for a few polls, and the first
+# `fail_first` generate calls answer 429 so retry paths get exercised; the
+# next `invalid_first` ones answer JSON that is missing required keys.
+
+def canned_answers() -> Dict[str, Any]:
+    samples = {'string': 'stub', 'number': 1.5, 'integer': 3}
+    return {k: samples[t] for k, (t, _) in QUESTIONS.items()}
+
+
+class _StubState:
+    def __init__(self, processing_polls: int, fail_first: int, answers: Dict[str, Any], invalid_first: int = 0):
+        self.processing_polls = processing_polls
+        self.fail_first = fail_first
+        self.invalid_first = invalid_first
+        self.answers = answers
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.polls: Dict[str, int] = {}
+        self.sessions: Dict[str, str] = {}
+        self.counts = {'upload': 0, 'get': 0, 'delete': 0, 'generate': 0}
+        self.uploaded_bytes = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+
+def _make_handler(state: _StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+        def _send(self, status: int, payload: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> bytes:
+            n = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(n) if n else b''
+
+        def _base(self) -> str:
+            host, port = self.server.server_address[:2]
+            return f"http://{host}:{port}"
+
+        def do_POST(self):
+            path = self.path.split('?', 1)[0]
+            body = self._body()
+            if path == '/upload/v1beta/files':
+                with state.lock:
+                    sid = f"s{next(state.ids)}"
+                    state.sessions[sid] = self.headers.get('X-Goog-Upload-Header-Content-Type', 'video/mp4')
+                self._send(200, {}, {'X-Goog-Upload-URL': f"{self._base()}/upload/session/{sid}"})
+                return
+            m = re.fullmatch(r'/upload/session/(\w+)', path)
+            if m:
+                with state.lock:
+                    mime = state.sessions.pop(m.group(1), None)
+                    if mime is None:
+                        self._send(404, {'error': 'unknown session'})
+                        return
+                    name = f"files/f{next(state.ids)}"
+                    f = {'name': name, 'uri': f"{self._base()}/v1beta/{name}", 'mimeType': mime,
+                         'sizeBytes': str(len(body)), 'state': 'PROCESSING' if state.processing_polls else 'ACTIVE'}
+                    state.files[name] = f
+                    state.polls[name] = 0
+                    state.counts['upload'] += 1
+                    state.uploaded_bytes += len(body)
+                self._send(200, {'file': f})
+                return
+            if re.fullmatch(r'/v1beta/models/[^/]+:generateContent', path):
+                with state.lock:
+                    state.counts['generate'] += 1
+                    n = state.counts['generate']
+                if n <= state.fail_first:
+                    self._send(429, {'error': 'rate limited'}, {'Retry-After': '0'})
+                    return
+                req = json.loads(body or b'{}')
+                invalid = n <= state.fail_first + state.invalid_first
+                text = json.dumps({'transcription': 'stub'} if invalid else state.answers)
+                prompt_tokens = sum(len(p.get('text', '')) // 4 for c in req.get('contents', []) for p in c.get('parts', []))
+                self._send(200, {
+                    'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}],
+                    'usageMetadata': {'promptTokenCount': prompt_tokens, 'totalTokenCount': prompt_tokens + len(text) // 4},
+                })
+                return
+            self._send(404, {'error': 'not found'})
+
+        def do_GET(self):
+            name = self.path.split('?', 1)[0][len('/v1beta/'):]
+            with state.lock:
+                f = state.files.get(name)
+                if f is not None:
+                    state.counts['get'] += 1
+                    state.polls[name] += 1
+                    if state.polls[name] >= state.processing_polls:
+                        f['state'] = 'ACTIVE'
+            if f is None:
+                self._send(404, {'error': 'not found'})
+            else:
+                self._send(200, f)
+
+        def do_DELETE(self):
+            name = self.path.split('?', 1)[0][len('/v1beta/'):]
+            with state.lock:
+                found = state.files.pop(name, None) is not None
+                if found:
+                    state.counts['delete'] += 1
+            self._send(200 if found else 404, {})
+
+    return Handler
+
+
+def start_stub_server(
+    host: str = '127.0.0.1',
+    port: int = 0,
+    processing_polls: int = 2,
+    fail_first: int = 0,
+    answers: Optional[Dict[str, Any]] = None,
+    invalid_first: int = 0,
+) -> Tuple[ThreadingHTTPServer, str, _StubState]:
+    """Start the stub in a daemon thread; returns (server, base_url, state). Call server.shutdown() when done."""
+    state = _StubState(processing_polls, fail_first, answers or canned_answers(), invalid_first)
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    h, p = server.server_address[:2]
+    return server, f"http://{h}:{p}", state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub of the Gemini REST API for offline annotation runs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processing-polls', type=int, default=2)
+    parser.add_argument('--fail-first', type=int, default=0)
+    parser.add_argument('--invalid-first', type=int, default=0)
+    args = parser.parse_args()
+
+    state = _StubState(args.processing_polls, args.fail_first, canned_answers(), args.invalid_first)
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(state))
+    print(f"Stub Gemini API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 from __future__ import annotations
+import functools
 
+
+# Cached so each worker loads the model once rather than once per item
+@functools.lru_cache(maxsize=1)
 def clip_embed_dim() -> int:
     try:
         import open_clip  # type: ignore
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 from PIL import Image
@@ -13,6 +14,7 @@ from ..utils import (
     saturation_proxy,
     aspect_ratio,
 )
+from .palette import image_palette
 
 
 def edge_density(img_arr: np.ndarray) -> float:
@@ -22,10 +24,42 @@ def edge_density(img_arr: np.ndarray) -> float:
     return float(np.mean(edges > 0))
 
 
-def extract_image_features(path: Path) -> dict:
+def _optional_features(load_rgb) -> dict:
+    feats = {}
+    # Optional OCR text area ratio
+    try:
+        from .ocr_optional import ocr_available, text_area_ratio
+        # Without a backend the ratio is 0.0; don't build the array just for that
+        feats['text_area_ratio'] = float(text_area_ratio(load_rgb())) if ocr_available() else 0.0
+    except Exception:
+        pass
+
+    # Optional CLIP embedding dimensionality (not the vector to keep CSV small)
+    try:
+        from .clip_optional import clip_embed_dim
+        feats['clip_dim'] = int(clip_embed_dim())
+    except Exception:
+        pass
+    return feats
+
+
+def extract_image_features(path: Path, tiled_min_pixels: Optional[int] = None, palette: bool = False) -> dict:
+    """
+    Images of `tiled_min_pixels` or more (default image_tiled.TILED_MIN_PIXELS)
+    are read in row bands by image_tiled instead of as one array; the
+    features are the same. `palette` adds the dominant-colour palette
+    (~25 ms of k-means per image, so it is opt-in).
+    """
+    from .image_tiled import TILED_MIN_PIXELS, tiled_image_features
+
     with Image.open(path) as im:
-        im = im.convert('RGB')
         w, h = im.size
+        if w * h >= (tiled_min_pixels or TILED_MIN_PIXELS):
+            feats = tiled_image_features(im, palette=palette)
+            # OCR needs the whole image; it is only materialised when a backend is installed
+            feats.update(_optional_features(lambda: np.asarray(im.convert('RGB'))))
+            return feats
+        im = im.convert('RGB')
         arr = np.array(im)
 
     mean_r, mean_g, mean_b = safe_mean_color(arr)
@@ -47,25 +81,8 @@ def extract_image_features(path: Path) -> dict:
         'edge_density': edge_density(arr),
     }
 
-    # Optional OCR text area ratio
-    try:
-        from .ocr_optional import text_area_ratio
-        feats['text_area_ratio'] = float(text_area_ratio(arr))
-    except Exception:
-        pass
-
-    # Optional CLIP embedding dimensionality (not the vector to keep CSV small)
-    try:
-        from .clip_optional import clip_embed_dim
-        feats['clip_dim'] = int(clip_embed_dim())
-    except Exception:
-        pass
-
-    # Company name features (placeholder for future implementation)
-    feats.update({
-        'company_name': '',
-        'has_company_name': False,
-        'company_name_length': 0
-    })
-
+    if palette:
+        # Dominant-colour palette (Lab centres + pixel shares) from a fixed-size subsample
+        feats.update(image_palette(arr))
+    feats.update(_optional_features(lambda: arr))
     return feats
@@ -0,0 +1,180 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+import cv2
+
+from ..utils import aspect_ratio
+from .image_basic import extract_image_features
+from .palette import image_palette
+
+
+# Batched path for thumbnail-sized creatives. Images are bucketed by padded
+# size and stacked into one zero-padded uint8 tensor per bucket. Every
+# statistic is a sum over pixels, so zero padding adds nothing and each sum
+# is divided by the image's true pixel count. The moments are integer sums,
+# so mean/std/colourfulness match image_basic to float rounding, not
+# approximately.
+
+SMALL_IMAGE_MAX_SIDE = 512
+BUCKET_STEP = 64
+CHUNK_PIXELS = 1 << 20   # padded pixels per stack; bounds the widened temporaries
+
+
+def _load_rgb(path: Path) -> np.ndarray:
+    with Image.open(path) as im:
+        return np.array(im.convert('RGB'))
+
+
+def _bucket_key(h: int, w: int) -> Tuple[int, int]:
+    return -(-h // BUCKET_STEP) * BUCKET_STEP, -(-w // BUCKET_STEP) * BUCKET_STEP
+
+
+def _chunk_moments(x: np.ndarray) -> Dict[str, np.ndarray]:
+    """Exact pixel sums for an N x H x W x 3 zero-padded uint8 stack."""
+    n = len(x)
+    # Planar copies: row reductions over contiguous uint8/uint16 are far cheaper than over interleaved RGB
+    r, g, b = (np.ascontiguousarray(x[..., c]).reshape(n, -1) for c in range(3))
+    s1 = np.stack([p.sum(1, dtype=np.int64) for p in (r, g, b)], axis=1)
+    s2 = np.stack([(p.astype(np.uint16) * p).sum(1, dtype=np.int64) for p in (r, g, b)], axis=1)
+    # Same uint8 wrap-around as colorfulness_hasler on uint8 input; yb is kept doubled so it stays integral
+    rg = r - g
+    yb2 = np.abs((r + g).astype(np.int16) - 2 * b.astype(np.int16)).astype(np.float32)
+    # 9 x per-pixel channel variance = sum of squared pairwise differences
+    q = np.zeros(r.shape, dtype=np.float32)
+    for u, v in ((r, g), (g, b), (b, r)):
+        d = cv2.absdiff(u, v).astype(np.uint16)
+        q += d * d
+    return {
+        's1': s1,
+        's2': s2,
+        'rg1': rg.sum(1, dtype=np.int64),
+        'rg2': (rg.astype(np.uint16) * rg).sum(1, dtype=np.int64),
+        'yb1': yb2.sum(1, dtype=np.float64).astype(np.int64),
+        'yb2': (yb2 * yb2).sum(1, dtype=np.float64).astype(np.int64),
+        'sat': np.sqrt(q, out=q).sum(1, dtype=np.float64) / 3.0,
+    }
+
+
+def _edge_densities(x: np.ndarray, shapes: List[Tuple[int, int]]) -> List[float]:
+    n, hp, wp = x.shape[:3]
+    # One colour conversion for the whole stack; Canny runs on each unpadded view
+    gray = cv2.cvtColor(np.ascontiguousarray(x).reshape(n * hp, wp, 3), cv2.COLOR_RGB2GRAY).reshape(n, hp, wp)
+    out = []
+    for i, (h, w) in enumerate(shapes):
+        edges = cv2.Canny(np.ascontiguousarray(gray[i, :h, :w]), 100, 200)
+        out.append(float(np.count_nonzero(edges)) / float(h * w))
+    return out
+
+
+def _var(s1: np.ndarray, s2: np.ndarray, npx: np.ndarray) -> np.ndarray:
+    # Python ints: n * s2 overflows int64 from ~12 MP (tiled images reach it)
+    d = npx.astype(object) * s2.astype(object) - s1.astype(object) ** 2
+    return np.maximum(d.astype(np.float64), 0) / (npx.astype(np.float64) ** 2)
+
+
+def _moment_features(m: Dict[str, np.ndarray], npx: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-image statistics from _chunk_moments sums (possibly accumulated over several chunks)."""
+    nf = npx.astype(np.float64)
+    mean = m['s1'] / nf[:, None]
+    rg_mean = m['rg1'] / nf
+    yb_mean = m['yb1'] / nf / 2.0
+    rg_std = np.sqrt(_var(m['rg1'], m['rg2'], npx))
+    yb_std = np.sqrt(_var(m['yb1'], m['yb2'], npx)) / 2.0
+    return {
+        'mean': mean,
+        'std': np.sqrt(_var(m['s1'], m['s2'], npx[:, None])),
+        'brightness': 0.2126 * mean[:, 0] + 0.7152 * mean[:, 1] + 0.0722 * mean[:, 2],
+        'saturation': m['sat'] / nf,
+        'colorfulness': np.sqrt(rg_std ** 2 + yb_std ** 2) + 0.3 * np.sqrt(rg_mean ** 2 + yb_mean ** 2),
+    }
+
+
+def _bucket_features(arrs: List[np.ndarray]) -> List[Dict[str, Any]]:
+    shapes = [a.shape[:2] for a in arrs]
+    hp = max(h for h, _ in shapes)
+    wp = max(w for _, w in shapes)
+    per_chunk = max(CHUNK_PIXELS // (hp * wp), 1)
+    feats: List[Dict[str, Any]] = []
+    for c0 in range(0, len(arrs), per_chunk):
+        part = arrs[c0:c0 + per_chunk]
+        part_shapes = shapes[c0:c0 + per_chunk]
+        x = np.zeros((len(part), hp, wp, 3), dtype=np.uint8)
+        for i, a in enumerate(part):
+            x[i, :a.shape[0], :a.shape[1]] = a
+        m = _moment_features(_chunk_moments(x), np.array([h * w for h, w in part_shapes], dtype=np.int64))
+        mean, std = m['mean'], m['std']
+        edges = _edge_densities(x, part_shapes)
+        for i, (h, w) in enumerate(part_shapes):
+            feats.append({
+                'width': int(w),
+                'height': int(h),
+                'aspect_ratio': aspect_ratio(w, h),
+                'mean_r': float(mean[i, 0]),
+                'mean_g': float(mean[i, 1]),
+                'mean_b': float(mean[i, 2]),
+                'std_r': float(std[i, 0]),
+                'std_g': float(std[i, 1]),
+                'std_b': float(std[i, 2]),
+                'brightness': float(m['brightness'][i]),
+                'saturation_proxy': float(m['saturation'][i]),
+                'colorfulness': float(m['colorfulness'][i]),
+                'edge_density': edges[i],
+            })
+    return feats
+
+
+def extract_image_features_batch(paths: List[Path], max_side: int = SMALL_IMAGE_MAX_SIDE, palette: bool = False) -> List[Dict[str, Any]]:
+    """
+    extract_image_features for many images at once, in input order.
+
+    Images up to `max_side` pixels on each side go through the bucketed
+    tensor path; larger ones fall back to extract_image_features. A file
+    that fails to load gets {'error': message}.
+    """
+    out: List[Dict[str, Any]] = [{} for _ in paths]
+    arrs: Dict[int, np.ndarray] = {}
+    for i, p in enumerate(paths):
+        try:
+            a = _load_rgb(p)
+        except Exception as e:
+            out[i] = {'error': str(e)}
+            continue
+        if max(a.shape[:2]) > max_side or min(a.shape[:2]) == 0:
+            try:
+                out[i] = extract_image_features(p, palette=palette)
+            except Exception as e:
+                out[i] = {'error': str(e)}
+            continue
+        arrs[i] = a
+
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    for i, a in arrs.items():
+        buckets.setdefault(_bucket_key(*a.shape[:2]), []).append(i)
+    for idxs in buckets.values():
+        for i, f in zip(idxs, _bucket_features([arrs[i] for i in idxs])):
+            out[i] = f
+
+    optional: Dict[str, Any] = {}
+    try:
+        from .clip_optional import clip_embed_dim
+        optional['clip_dim'] = int(clip_embed_dim())
+    except Exception:
+        pass
+    try:
+        from .ocr_optional import text_area_ratio
+    except Exception:
+        text_area_ratio = None
+    for i, a in arrs.items():
+        if palette:
+            # The palette's k-means is compute-bound per image; stacking it did not pay off
+            out[i].update(image_palette(a))
+        if text_area_ratio is not None:
+            try:
+                out[i]['text_area_ratio'] = float(text_area_ratio(a))
+            except Exception:
+                pass
+        out[i].update(optional)
+    return out
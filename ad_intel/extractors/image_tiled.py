@@ -0,0 +1,128 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+import cv2
+
+from ..utils import aspect_ratio
+from .image_batch import _chunk_moments, _moment_features
+from .palette import PALETTE_K, PALETTE_SAMPLE, PALETTE_SEED, palette_from_lab, rgb_to_lab, stratified_coords
+
+
+# Row-band path for very large images. The whole-image path holds the RGB
+# array plus several float copies of it (std, saturation, colourfulness),
+# roughly 30 bytes per pixel on top of the decoded image. Here the decoded
+# image is read one band of rows at a time and every statistic is
+# accumulated, so the working set is a few bands whatever the resolution.
+#
+# Colour moments are the exact integer sums of the batched path. Edge
+# density is exact as well: each band is run through Canny with two rows of
+# context on either side (Sobel plus non-maximum suppression need two), once
+# with both thresholds at the low value (every NMS survivor above low) and
+# once at the high value (the strong pixels). Canny's hysteresis keeps the
+# 8-connected components of the first set that contain a strong pixel, so
+# components are labelled per band and joined across band seams with a
+# union-find. The palette draws the same stratified pixel coordinates as the
+# whole-image path and picks them up band by band.
+
+TILED_MIN_PIXELS = 1 << 23    # ~8.4 MP; 4K UHD frames and smaller stay on the whole-image path
+BAND_PIXELS = 1 << 20         # pixels per row band
+CANNY_LOW = 100
+CANNY_HIGH = 200
+EDGE_CONTEXT_ROWS = 2
+
+
+class _EdgeCounter:
+    """Count of cv2.Canny(gray, low, high) edge pixels, fed one row band at a time."""
+
+    def __init__(self, low: int = CANNY_LOW, high: int = CANNY_HIGH):
+        self.low = low
+        self.high = high
+        self.parent: List[int] = []
+        self.area: List[int] = []
+        self.strong: List[bool] = []
+        self._seam: Optional[np.ndarray] = None  # component ids of the previous band's last row, -1 for none
+
+    def _find(self, a: int) -> int:
+        parent = self.parent
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    def add(self, gray: np.ndarray, top: int, bottom: int) -> None:
+        # `gray` carries `top` and `bottom` context rows around the band's own rows
+        end = gray.shape[0] - bottom
+        weak = cv2.Canny(gray, self.low, self.low)[top:end]
+        strong = cv2.Canny(gray, self.high, self.high)[top:end]
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(weak, connectivity=8)
+        base = len(self.parent) - 1  # band label i -> global id base + i
+        self.parent.extend(range(base + 1, base + n))
+        self.area.extend(stats[1:, cv2.CC_STAT_AREA].tolist())
+        self.strong.extend((np.bincount(labels[strong > 0], minlength=n)[1:] > 0).tolist())
+
+        first = np.where(labels[0] > 0, labels[0] + base, -1)
+        if self._seam is not None:
+            w = len(first)
+            pairs = []
+            for dx in (-1, 0, 1):
+                cur = first[max(-dx, 0):w - max(dx, 0)]
+                prev = self._seam[max(dx, 0):w - max(-dx, 0)]
+                hit = (cur >= 0) & (prev >= 0)
+                pairs.append(np.stack([cur[hit], prev[hit]], axis=1))
+            for a, b in np.unique(np.concatenate(pairs), axis=0).tolist():
+                ra, rb = self._find(a), self._find(b)
+                if ra != rb:
+                    self.parent[ra] = rb
+        self._seam = np.where(labels[-1] > 0, labels[-1] + base, -1)
+
+    def count(self) -> int:
+        roots = [self._find(i) for i in range(len(self.parent))]
+        keep = set(r for r, s in zip(roots, self.strong) if s)
+        return sum(a for r, a in zip(roots, self.area) if r in keep)
+
+
+def tiled_image_features(im: Image.Image, band_pixels: int = BAND_PIXELS, palette: bool = False) -> Dict[str, Any]:
+    """
+    Same features as extract_image_features (without the optional OCR/CLIP
+    ones) for an open PIL image, reading it in row bands. Colour conversion
+    is per pixel, so each band is converted to RGB on its own.
+    """
+    w, h = im.size
+    rows = max(band_pixels // max(w, 1), EDGE_CONTEXT_ROWS + 1)
+    ys, xs = stratified_coords(h, w, PALETTE_SAMPLE, seed=PALETTE_SEED)
+    sample = np.empty((len(ys), 3), dtype=np.uint8)
+    sums: Dict[str, np.ndarray] = {}
+    edges = _EdgeCounter()
+    for y0 in range(0, h, rows):
+        y1 = min(y0 + rows, h)
+        a, b = max(y0 - EDGE_CONTEXT_ROWS, 0), min(y1 + EDGE_CONTEXT_ROWS, h)
+        band = np.asarray(im.crop((0, a, w, b)).convert('RGB'))
+        core = band[y0 - a:y1 - a]
+        for k, v in _chunk_moments(core[None]).items():
+            sums[k] = sums[k] + v if k in sums else v
+        edges.add(cv2.cvtColor(band, cv2.COLOR_RGB2GRAY), y0 - a, b - y1)
+        if palette:
+            sel = (ys >= y0) & (ys < y1)
+            sample[sel] = core[ys[sel] - y0, xs[sel]]
+
+    m = _moment_features(sums, np.array([h * w], dtype=np.int64))
+    feats = {
+        'width': int(w),
+        'height': int(h),
+        'aspect_ratio': aspect_ratio(w, h),
+        'mean_r': float(m['mean'][0, 0]),
+        'mean_g': float(m['mean'][0, 1]),
+        'mean_b': float(m['mean'][0, 2]),
+        'std_r': float(m['std'][0, 0]),
+        'std_g': float(m['std'][0, 1]),
+        'std_b': float(m['std'][0, 2]),
+        'brightness': float(m['brightness'][0]),
+        'saturation_proxy': float(m['saturation'][0]),
+        'colorfulness': float(m['colorfulness'][0]),
+        'edge_density': float(edges.count()) / float(h * w),
+    }
+    if palette:
+        feats.update(palette_from_lab(rgb_to_lab(sample), k=PALETTE_K, seed=PALETTE_SEED))
+    return feats
@@ -1,12 +1,25 @@
 from __future__ import annotations
+import functools
+import importlib.util
+
 import numpy as np
 
 # Tries EasyOCR first (no external binary), else Tesseract via pytesseract.
 
+
+@functools.lru_cache(maxsize=1)
+def _easyocr_reader():
+    import easyocr  # type: ignore
+    return easyocr.Reader(['en'], gpu=False)
+
+
+def ocr_available() -> bool:
+    return any(importlib.util.find_spec(m) is not None for m in ('easyocr', 'pytesseract'))
+
+
 def text_area_ratio(img_rgb: np.ndarray) -> float:
     try:
-        import easyocr  # type: ignore
-        reader = easyocr.Reader(['en'], gpu=False)
+        reader = _easyocr_reader()
         results = reader.readtext(img_rgb)
         H, W = img_rgb.shape[:2]
         total = 0.0
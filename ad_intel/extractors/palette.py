@@ -0,0 +1,128 @@
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+import cv2
+
+
+# Dominant-colour palette: top-k colours in CIE Lab with their pixel shares.
+# Cost is bounded by the pixel subsample, not the image resolution: pixels
+# are drawn stratified over a grid (so small regions still get represented)
+# with a fixed seed, then clustered by mini-batch k-means.
+
+PALETTE_K = 5
+PALETTE_SAMPLE = 4096
+PALETTE_SEED = 0
+VIDEO_PIXELS_PER_FRAME = 256
+
+
+def stratified_coords(h: int, w: int, n: int, seed: int = PALETTE_SEED, grid: int = 8) -> tuple[np.ndarray, np.ndarray]:
+    """Row and column indices of ~n pixels, an equal share drawn uniformly from each grid cell."""
+    gy, gx = min(grid, h), min(grid, w)
+    rng = np.random.default_rng(seed)
+    per_cell = max(n // (gy * gx), 1)
+    ys_edges = np.linspace(0, h, gy + 1).astype(np.int64)
+    xs_edges = np.linspace(0, w, gx + 1).astype(np.int64)
+    y0 = np.repeat(ys_edges[:-1], gx)
+    y1 = np.repeat(ys_edges[1:], gx)
+    x0 = np.tile(xs_edges[:-1], gy)
+    x1 = np.tile(xs_edges[1:], gy)
+    # One vectorised draw for all cells: offsets scaled into each cell's extent
+    ys = (y0[:, None] + rng.random((gy * gx, per_cell)) * (y1 - y0)[:, None]).astype(np.int64).ravel()
+    xs = (x0[:, None] + rng.random((gy * gx, per_cell)) * (x1 - x0)[:, None]).astype(np.int64).ravel()
+    return np.minimum(ys, h - 1), np.minimum(xs, w - 1)
+
+
+def stratified_sample(img_rgb: np.ndarray, n: int, seed: int = PALETTE_SEED, grid: int = 8) -> np.ndarray:
+    """Return ~n RGB pixels (n x 3 uint8), an equal share drawn uniformly from each grid cell."""
+    ys, xs = stratified_coords(img_rgb.shape[0], img_rgb.shape[1], n, seed=seed, grid=grid)
+    return img_rgb[ys, xs]
+
+
+def rgb_to_lab(pixels_rgb: np.ndarray) -> np.ndarray:
+    # OpenCV float path: L in [0, 100], a/b roughly [-127, 127]
+    px = (pixels_rgb.reshape(-1, 1, 3).astype(np.float32) / 255.0)
+    return cv2.cvtColor(px, cv2.COLOR_RGB2Lab).reshape(-1, 3)
+
+
+def _sq_dists(x: np.ndarray, c: np.ndarray) -> np.ndarray:
+    d = (x * x).sum(1)[:, None] - 2.0 * x @ c.T + (c * c).sum(1)[None, :]
+    return np.maximum(d, 0.0)
+
+
+def _kmeans_pp(x: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centers = np.empty((k, x.shape[1]), dtype=np.float64)
+    centers[0] = x[rng.integers(len(x))]
+    d = _sq_dists(x, centers[:1]).ravel()
+    for i in range(1, k):
+        total = d.sum()
+        idx = rng.choice(len(x), p=d / total) if total > 0 else rng.integers(len(x))
+        centers[i] = x[idx]
+        d = np.minimum(d, _sq_dists(x, centers[i:i + 1]).ravel())
+    return centers
+
+
+def minibatch_kmeans(
+    x: np.ndarray,
+    k: int,
+    seed: int = PALETTE_SEED,
+    batch_size: int = 1024,
+    iters: int = 50,
+    tol: float = 1e-3,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sculley-style mini-batch k-means with k-means++ init.
+
+    Returns (centers k x d, labels for every row of x).
+    """
+    x = x.astype(np.float64, copy=False)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centers = _kmeans_pp(x, k, rng)
+    counts = np.zeros(k, dtype=np.float64)
+    for _ in range(iters):
+        batch = x[rng.integers(0, len(x), size=min(batch_size, len(x)))]
+        lab = _sq_dists(batch, centers).argmin(1)
+        prev = centers.copy()
+        # Per-center learning rate 1/count, applied to all batch members at once
+        sums = np.zeros_like(centers)
+        np.add.at(sums, lab, batch)
+        hits = np.bincount(lab, minlength=k).astype(np.float64)
+        counts += hits
+        moved = hits > 0
+        eta = np.zeros(k)
+        eta[moved] = hits[moved] / counts[moved]
+        means = np.divide(sums, hits[:, None], out=np.zeros_like(sums), where=hits[:, None] > 0)
+        centers[moved] = (1 - eta[moved, None]) * centers[moved] + eta[moved, None] * means[moved]
+        if np.abs(centers - prev).max() < tol:
+            break
+    labels = _sq_dists(x, centers).argmin(1)
+    return centers, labels
+
+
+def palette_from_lab(lab: np.ndarray, k: int = PALETTE_K, seed: int = PALETTE_SEED) -> dict:
+    feats: dict = {}
+    if len(lab) == 0:
+        return feats
+    centers, labels = minibatch_kmeans(lab, k, seed=seed)
+    shares = np.bincount(labels, minlength=len(centers)) / float(len(labels))
+    order = np.argsort(-shares, kind='stable')
+    for rank in range(k):
+        if rank < len(order):
+            c, s = centers[order[rank]], shares[order[rank]]
+            feats[f'palette_{rank}_l'] = float(c[0])
+            feats[f'palette_{rank}_a'] = float(c[1])
+            feats[f'palette_{rank}_b'] = float(c[2])
+            feats[f'palette_{rank}_share'] = float(s)
+    return feats
+
+
+def image_palette(img_rgb: np.ndarray, k: int = PALETTE_K, n: int = PALETTE_SAMPLE, seed: int = PALETTE_SEED) -> dict:
+    if img_rgb.ndim != 3 or img_rgb.shape[2] != 3:
+        return {}
+    return palette_from_lab(rgb_to_lab(stratified_sample(img_rgb, n, seed=seed)), k=k, seed=seed)
+
+
+def keyframe_sample_lab(frame_rgb: np.ndarray, sample_index: int, n: Optional[int] = None) -> np.ndarray:
+    # Seeded by the sampled-frame index so segmented and sequential runs draw the same pixels
+    return rgb_to_lab(stratified_sample(frame_rgb, n or VIDEO_PIXELS_PER_FRAME, seed=PALETTE_SEED + sample_index, grid=4))
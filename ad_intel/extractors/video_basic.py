@@ -1,10 +1,12 @@
 from __future__ import annotations
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import cv2
 
 from ..utils import aspect_ratio
+from .palette import keyframe_sample_lab, palette_from_lab
 
 
 def _read_video_capture(path: Path):
@@ -14,23 +16,63 @@ def _read_video_capture(path: Path):
     return cap
 
 
-def _iter_sampled_frames(cap, frame_interval_sec: float, max_frames: int):
-    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+def _sample_step(cap, frame_interval_sec: float) -> int:
+    return _step_for_fps(cap.get(cv2.CAP_PROP_FPS) or 0.0, frame_interval_sec)
+
+
+def _step_for_fps(fps: float, frame_interval_sec: float) -> int:
     if fps <= 0:
         fps = 30.0
-    step = max(int(round(frame_interval_sec * fps)), 1)
+    return max(int(round(frame_interval_sec * fps)), 1)
+
+
+def sample_times(fps: float, frame_interval_sec: float, n: int) -> np.ndarray:
+    # Timestamps (seconds) of the first n sampled frames
+    step = _step_for_fps(fps, frame_interval_sec)
+    return np.arange(n, dtype=np.float32) * (step / (fps if fps > 0 else 30.0))
+
 
-    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    grabbed = 0
+def resize_center_crop(frame_rgb, resize=256, crop=224):
+    """
+    Resize the shorter side to `resize` and center-crop to `crop` x `crop` with OpenCV,
+    matching the Resize/CenterCrop transform without a PIL round-trip.
+
+    Args:
+        frame_rgb (numpy.ndarray): HxWx3 uint8 RGB frame
+
+    Returns:
+        numpy.ndarray: crop x crop x 3 uint8 array
+    """
+    h, w = frame_rgb.shape[:2]
+    scale = resize / float(min(h, w))
+    nw, nh = max(int(round(w * scale)), crop), max(int(round(h * scale)), crop)
+    # INTER_AREA when shrinking approximates PIL's antialiased bilinear resize
+    interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    resized = cv2.resize(frame_rgb, (nw, nh), interpolation=interp)
+    top = (nh - crop) // 2
+    left = (nw - crop) // 2
+    return resized[top:top + crop, left:left + crop]
+
+
+def _iter_sampled_frames(cap, frame_interval_sec: float, max_frames: int, start_sample: int = 0, dst=None):
+    # Yields sampled frames with sample index in [start_sample, max_frames); seeks when start_sample > 0.
+    # dst, if given, is called for each kept frame and returns an array to decode into
+    step = _sample_step(cap, frame_interval_sec)
+    if start_sample > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_sample * step)
+    sample = start_sample
     idx = 0
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        # grab() decodes; retrieve() only converts the frames we keep
+        if not cap.grab():
             break
         if idx % step == 0:
+            ret, frame = cap.retrieve(dst()) if dst is not None else cap.retrieve()
+            if not ret:
+                break
             yield frame
-            grabbed += 1
-            if grabbed >= max_frames:
+            sample += 1
+            if sample >= max_frames:
                 break
         idx += 1
 
@@ -41,77 +83,124 @@ def _motion_intensity(prev_gray: np.ndarray, gray: np.ndarray) -> float:
     return float(np.mean(diff))
 
 
+def _frame_hist(frame_rgb: np.ndarray) -> np.ndarray:
+    # Normalized HSV hue/saturation histogram used for shot-change detection
+    hsv = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [50, 50], [0, 180, 0, 256])
+    cv2.normalize(hist, hist)
+    return hist
+
+
 def _shot_change(prev_hist: np.ndarray, hist: np.ndarray) -> bool:
     # Histogram correlation threshold for shot change
     corr = cv2.compareHist(prev_hist, hist, cv2.HISTCMP_CORREL)
     return bool(corr < 0.7)
 
 
-def extract_video_features(path: Path, frame_interval: float, max_frames: int) -> dict:
-    cap = _read_video_capture(path)
+def _video_header(cap) -> dict:
     fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
-    duration_sec = float(frame_count / fps) if fps > 0 else 0.0
+    return {
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0),
+        'fps': fps,
+        'frame_count': frame_count,
+        'duration_sec': float(frame_count / fps) if fps > 0 else 0.0,
+    }
+
 
-    motions = []
-    shot_changes = 0
+def _early_frame_count(fps: float) -> int:
+    return max(int((fps or 30) * 3), 1)
 
-    prev_gray = None
-    prev_hist = None
 
-    for frame_bgr in _iter_sampled_frames(cap, frame_interval, max_frames):
+class _SampledFrameStats:
+    # Running motion / shot-change / palette state over consecutive sampled frames.
+    # Frames with sample index below `start` only serve as the "previous" frame.
+    # With `crop`, each frame is also kept as a crop x crop RGB model input, with
+    # its shot id, so video embeddings reuse this decode instead of a second one.
+    def __init__(self, start: int = 0, crop: Optional[int] = None):
+        self.start = start
+        self.crop = crop
+        self.motions: list = []
+        self.shot_changes = 0
+        self.palette_lab: list = []
+        self.crops: list = []
+        self.shot_ids: list = []
+        self.prev_gray = None
+        self.prev_hist = None
+
+    def add(self, frame_bgr: np.ndarray, sample_index: int) -> None:
         frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        if sample_index >= self.start:
+            self.palette_lab.append(keyframe_sample_lab(frame_rgb, sample_index))
         gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
 
         # motion
-        if prev_gray is not None:
-            motions.append(_motion_intensity(prev_gray, gray))
-        prev_gray = gray
+        if self.prev_gray is not None:
+            self.motions.append(_motion_intensity(self.prev_gray, gray))
+        self.prev_gray = gray
 
         # shot change via HSV histogram
-        hsv = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2HSV)
-        hist = cv2.calcHist([hsv], [0, 1], None, [50, 50], [0, 180, 0, 256])
-        cv2.normalize(hist, hist)
-        if prev_hist is not None and _shot_change(prev_hist, hist):
-            shot_changes += 1
-        prev_hist = hist
+        hist = _frame_hist(frame_rgb)
+        if self.prev_hist is not None and _shot_change(self.prev_hist, hist):
+            self.shot_changes += 1
+        self.prev_hist = hist
 
-    cap.release()
+        if self.crop and sample_index >= self.start:
+            self.crops.append(resize_center_crop(frame_rgb, resize=256 * self.crop // 224, crop=self.crop))
+            self.shot_ids.append(self.shot_changes)
 
-    avg_motion = float(np.mean(motions)) if motions else 0.0
+    def embed_fields(self) -> dict:
+        # Internal row keys consumed by video_embedding.VideoEmbedder.add; never written out
+        if not self.crop:
+            return {}
+        frames = np.stack(self.crops) if self.crops else np.zeros((0, self.crop, self.crop, 3), dtype=np.uint8)
+        return {'_embed_frames': frames, '_embed_shots': np.asarray(self.shot_ids, dtype=np.int32)}
 
-    # Early action ratio: motion in first 3 seconds vs overall
-    cap2 = _read_video_capture(path)
-    early_frames = max(int((fps or 30) * 3), 1)
-    idx = 0
-    motions_early = []
-    prev_gray = None
-    while idx < early_frames:
-        ret, frame = cap2.read()
+
+class _EarlyMotion:
+    # Motion between consecutive decoded frames of the early window
+    def __init__(self):
+        self.motions: list = []
+        self.prev_gray = None
+
+    def add(self, frame_bgr: np.ndarray) -> None:
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        if self.prev_gray is not None:
+            self.motions.append(_motion_intensity(self.prev_gray, gray))
+        self.prev_gray = gray
+
+
+def _sampled_frame_stats(cap, frame_interval: float, start: int, end: int, crop: Optional[int] = None) -> _SampledFrameStats:
+    # Motion and shot changes between consecutive sampled frames with index in [start, end),
+    # plus a Lab pixel subsample of each of those frames for the palette.
+    # For start > 0 the frame at start - 1 is decoded as well, only as the "previous" frame,
+    # so pairs straddling a segment seam are counted exactly once.
+    stats = _SampledFrameStats(start, crop)
+    begin = max(start - 1, 0)
+    for offset, frame_bgr in enumerate(_iter_sampled_frames(cap, frame_interval, end, start_sample=begin)):
+        stats.add(frame_bgr, begin + offset)
+    return stats
+
+
+def _early_motions(cap, start: int, end: int) -> list:
+    # Motion between consecutive decoded frames with index in [start, end), same seam rule as above
+    begin = max(start - 1, 0)
+    if begin > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, begin)
+    idx = begin
+    track = _EarlyMotion()
+    while idx < end:
+        ret, frame = cap.read()
         if not ret:
             break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        if prev_gray is not None:
-            motions_early.append(_motion_intensity(prev_gray, gray))
-        prev_gray = gray
+        track.add(frame)
         idx += 1
-    cap2.release()
+    return track.motions
 
-    early_action_ratio = float(np.mean(motions_early) / avg_motion) if (motions_early and avg_motion > 1e-6) else 0.0
 
-    feats = {
-        'width': width,
-        'height': height,
-        'aspect_ratio': aspect_ratio(width, height),
-        'fps': fps,
-        'duration_sec': duration_sec,
-        'frame_count': frame_count,
-        'avg_motion': avg_motion,
-        'shot_changes': int(shot_changes),
-        'early_action_ratio': early_action_ratio,
-    }
+def _optional_video_features(path: Path) -> dict:
+    feats = {}
 
     # Optional audio features
     try:
@@ -127,17 +216,108 @@ def extract_video_features(path: Path, frame_interval: float, max_frames: int) -
     except Exception:
         pass
 
-    # Audio transcript features (placeholder for future implementation)
-    feats.update({
-        'transcript': '',
-        'has_speech': False,
-        'word_count': 0,
-        'sentence_count': 0,
-        'avg_words_per_sentence': 0.0,
-        'transcript_length': 0,
-        'ad_keyword_count': 0,
-        'ad_keyword_density': 0.0,
-        'has_call_to_action': False,
-    })
+    return feats
+
 
+def _finalize(header: dict, motions: list, shot_changes: int, motions_early: list, palette_lab: list, extras: dict) -> dict:
+    avg_motion = float(np.mean(motions)) if motions else 0.0
+    early_action_ratio = float(np.mean(motions_early) / avg_motion) if (motions_early and avg_motion > 1e-6) else 0.0
+
+    feats = {
+        'width': header['width'],
+        'height': header['height'],
+        'aspect_ratio': aspect_ratio(header['width'], header['height']),
+        'fps': header['fps'],
+        'duration_sec': header['duration_sec'],
+        'frame_count': header['frame_count'],
+        'avg_motion': avg_motion,
+        'shot_changes': int(shot_changes),
+        'early_action_ratio': early_action_ratio,
+    }
+    # Dominant colours over all keyframes
+    if palette_lab:
+        feats.update(palette_from_lab(np.concatenate(palette_lab)))
+    feats.update(extras)
     return feats
+
+
+def extract_video_features(path: Path, frame_interval: float, max_frames: int, embed_crop: Optional[int] = None) -> dict:
+    cap = _read_video_capture(path)
+    header = _video_header(cap)
+    stats = _sampled_frame_stats(cap, frame_interval, 0, max_frames, embed_crop)
+    cap.release()
+
+    # Early action ratio: motion in first 3 seconds vs overall
+    cap2 = _read_video_capture(path)
+    motions_early = _early_motions(cap2, 0, _early_frame_count(header['fps']))
+    cap2.release()
+
+    feats = _finalize(header, stats.motions, stats.shot_changes, motions_early, stats.palette_lab, _optional_video_features(path))
+    feats.update(stats.embed_fields())
+    return feats
+
+
+def plan_video_segments(path: Path, frame_interval: float, max_frames: int, segment_sec: float) -> Optional[dict]:
+    """
+    Split a long video into independently decodable segments.
+
+    Returns None when the video is shorter than one segment. Otherwise
+    returns {'header': ..., 'segments': [spec, ...]}: 'sampled' specs
+    cover ranges of sampled-frame indices, and one 'early' spec covers the
+    first-3-seconds window plus the optional audio/CLIP features. The
+    results of extract_video_segment for all specs combine in
+    merge_video_segments to the same values extract_video_features gives.
+    """
+    cap = _read_video_capture(path)
+    header = _video_header(cap)
+    step = _sample_step(cap, frame_interval)
+    cap.release()
+
+    fps = header['fps'] if header['fps'] > 0 else 30.0
+    n_samples = min(max_frames, -(-header['frame_count'] // step)) if header['frame_count'] > 0 else 0
+    per_segment = max(int(round(segment_sec * fps / step)), 2)
+    if n_samples <= per_segment:
+        return None
+
+    segments = []
+    for start in range(0, n_samples, per_segment):
+        end = start + per_segment
+        # The last segment runs to max_frames in case CAP_PROP_FRAME_COUNT under-reports
+        segments.append({'kind': 'sampled', 'start': start, 'end': end if end < n_samples else max_frames})
+    segments.append({'kind': 'early', 'start': 0, 'end': _early_frame_count(header['fps'])})
+    return {'header': header, 'segments': segments}
+
+
+def extract_video_segment(path: Path, frame_interval: float, spec: dict, embed_crop: Optional[int] = None) -> dict:
+    cap = _read_video_capture(path)
+    try:
+        if spec['kind'] == 'sampled':
+            st = _sampled_frame_stats(cap, frame_interval, spec['start'], spec['end'], embed_crop)
+            return {'kind': 'sampled', 'start': spec['start'], 'motions': st.motions, 'shot_changes': st.shot_changes,
+                    'palette_lab': st.palette_lab, **st.embed_fields()}
+        if spec['kind'] == 'early':
+            motions_early = _early_motions(cap, spec['start'], spec['end'])
+            return {'kind': 'early', 'start': spec['start'], 'motions': motions_early, 'extras': _optional_video_features(path)}
+        raise ValueError(f"Unknown segment kind: {spec['kind']}")
+    finally:
+        cap.release()
+
+
+def merge_video_segments(header: dict, partials: list) -> dict:
+    sampled = sorted((p for p in partials if p['kind'] == 'sampled'), key=lambda p: p['start'])
+    early = sorted((p for p in partials if p['kind'] == 'early'), key=lambda p: p['start'])
+    # Concatenate in time order so the means are bit-identical to the sequential path
+    motions = [m for p in sampled for m in p['motions']]
+    shot_changes = sum(p['shot_changes'] for p in sampled)
+    palette_lab = [lab for p in sampled for lab in p['palette_lab']]
+    motions_early = [m for p in early for m in p['motions']]
+    extras = {}
+    for p in early:
+        extras.update(p.get('extras', {}))
+    out = _finalize(header, motions, shot_changes, motions_early, palette_lab, extras)
+    if sampled and '_embed_frames' in sampled[0]:
+        # Segment shot ids are local; offset them by the shot changes before the segment
+        offsets = np.cumsum([0] + [p['shot_changes'] for p in sampled[:-1]])
+        out['_embed_frames'] = np.concatenate([p['_embed_frames'] for p in sampled])
+        out['_embed_shots'] = np.concatenate([p['_embed_shots'] + off for p, off in zip(sampled, offsets)]).astype(np.int32)
+    return out
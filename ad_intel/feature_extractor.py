@@ -4,43 +4,70 @@ import torchvision.transforms as transforms
 from PIL import Image
 import numpy as np
 
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
+
+class _ClipImageEncoder(torch.nn.Module):
+    def __init__(self, clip_model):
+        super().__init__()
+        self.clip_model = clip_model
+
+    def forward(self, x):
+        return self.clip_model.encode_image(x)
+
+
 class ImageFeatureExtractor:
     def __init__(self, model_name='resnet50', use_gpu=False):
         """
         Initialize the feature extractor with a pre-trained model.
         
         Args:
-            model_name (str): Name of the pre-trained model to use (default: 'resnet50')
+            model_name (str): Name of the pre-trained model to use: 'resnet50', 'vgg16' or 'clip' (default: 'resnet50')
             use_gpu (bool): Whether to use GPU if available (default: False)
         """
         self.device = torch.device("cuda" if use_gpu and torch.cuda.is_available() else "cpu")
         self.model_name = model_name.lower()
         
-        # Load pre-trained model
+        # Load pre-trained model; sets self.embed_dim from its config
         self.model = self._load_pretrained_model()
         self.model = self.model.to(self.device)
         self.model.eval()  # Set to evaluation mode
         
+        mean, std = (CLIP_MEAN, CLIP_STD) if self.model_name == 'clip' else (IMAGENET_MEAN, IMAGENET_STD)
+        self._mean = torch.tensor(mean, device=self.device).view(1, 3, 1, 1)
+        self._std = torch.tensor(std, device=self.device).view(1, 3, 1, 1)
+
         # Define image transformations
         self.transform = transforms.Compose([
             transforms.Resize(256),
             transforms.CenterCrop(224),
             transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])
+            transforms.Normalize(mean=list(mean),
+                               std=list(std))
         ])
     
     def _load_pretrained_model(self):
         """Load pre-trained model and modify it to return features instead of classification."""
         if self.model_name == 'resnet50':
             model = models.resnet50(pretrained=True)
+            self.embed_dim = model.fc.in_features
             # Remove the last fully connected layer to get features
             model = torch.nn.Sequential(*(list(model.children())[:-1]))
         elif self.model_name == 'vgg16':
             model = models.vgg16(pretrained=True)
+            # Flattened 512 x 7 x 7 conv features
+            self.embed_dim = model.classifier[0].in_features
             # Remove the classifier to get features
             model = model.features
             model.avgpool = torch.nn.AdaptiveAvgPool2d((7, 7))
+        elif self.model_name == 'clip':
+            import open_clip  # type: ignore
+            clip_model, _, _ = open_clip.create_model_and_transforms('ViT-B-32', pretrained='laion2b_s34b_b79k')
+            self.embed_dim = clip_model.visual.output_dim
+            model = _ClipImageEncoder(clip_model)
         else:
             raise ValueError(f"Unsupported model: {self.model_name}")
         
@@ -109,3 +136,27 @@ class ImageFeatureExtractor:
             return np.array([])
             
         return np.vstack(all_features)
+
+    def embed_arrays(self, frames, batch_size=64):
+        """
+        Extract features from preprocessed uint8 frames, skipping PIL entirely.
+
+        Args:
+            frames (numpy.ndarray): N x 224 x 224 x 3 uint8 RGB array (see extractors.video_basic.resize_center_crop)
+            batch_size (int): Batch size for processing (default: 64)
+
+        Returns:
+            numpy.ndarray: N x D float32 array of features
+        """
+        if len(frames) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        out = []
+        with torch.no_grad():
+            for i in range(0, len(frames), batch_size):
+                chunk = torch.from_numpy(np.ascontiguousarray(frames[i:i + batch_size])).to(self.device)
+                # NHWC uint8 -> normalized NCHW float in one batched op
+                x = chunk.permute(0, 3, 1, 2).float().div_(255.0)
+                x = (x - self._mean) / self._std
+                feats = self.model(x)
+                out.append(feats.view(feats.size(0), -1).float().cpu().numpy())
+        return np.vstack(out)
@@ -0,0 +1,351 @@
+from __future__ import annotations
+import multiprocessing as mp
+import queue
+import shutil
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .extractors.video_basic import (
+    _EarlyMotion,
+    _SampledFrameStats,
+    _early_frame_count,
+    _finalize,
+    _iter_sampled_frames,
+    _optional_video_features,
+    _read_video_capture,
+    _video_header,
+)
+from .resources import apply_thread_limits
+
+
+# Two-stage video pipeline. Decoder processes decode straight into slots of
+# a shared-memory ring (cv2 retrieve() writes into the slot view) and pass
+# only (slot, shape) over a queue; analysis processes read the slot as a
+# NumPy view and hand it back when done. The free-slot queue is the
+# backpressure: a decoder blocks once every slot is in flight. Frames are
+# never pickled.
+#
+# Each video is analysed by one analyser (video index mod analysers) so its
+# frames stay in order, and the per-video state is the same
+# _SampledFrameStats / _EarlyMotion used by extract_video_features, so the
+# results are identical to the single-process path.
+#
+# Every process publishes the video it is working on in a shared array. If
+# one dies, or a video runs past its deadline, that video gets an error row
+# ('worker_died' / 'timeout', as in SupervisedPool) and the ring is torn
+# down and restarted for the videos not finished yet: a dead process can
+# take ring slots and half-analysed videos with it, so nothing of the old
+# ring is reused.
+
+DEFAULT_RING_BYTES = 256 * 1024 * 1024
+SLOTS_PER_PROCESS = 4      # frames in flight per decoder/analyser; more only adds memory
+POLL_INTERVAL = 0.2
+
+
+def default_ring_bytes() -> int:
+    """DEFAULT_RING_BYTES, or half the free space of /dev/shm if that is smaller (containers often mount 64 MB)."""
+    try:
+        return int(min(DEFAULT_RING_BYTES, shutil.disk_usage('/dev/shm').free // 2))
+    except OSError:
+        return DEFAULT_RING_BYTES
+
+
+class FrameRing:
+    def __init__(self, slot_bytes: int, slots: int, shm: Optional[shared_memory.SharedMemory] = None):
+        self.slot_bytes = int(slot_bytes)
+        self.slots = int(slots)
+        self.shm = shm or shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slots)
+        self._owner = shm is None
+
+    @classmethod
+    def attach(cls, name: str, slot_bytes: int, slots: int) -> 'FrameRing':
+        return cls(slot_bytes, slots, shared_memory.SharedMemory(name=name))
+
+    def view(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self) -> None:
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _probe_frame_bytes(items: List[Dict[str, Any]]) -> int:
+    largest = 0
+    for it in items:
+        try:
+            cap = _read_video_capture(Path(it['path']))
+        except Exception:
+            continue
+        h = _video_header(cap)
+        cap.release()
+        largest = max(largest, h['width'] * h['height'] * 3)
+    return largest
+
+
+def _decoder_main(ring_args, tasks, free, outs, frame_interval: float, max_frames: int, current, me: int, threads: int) -> None:
+    apply_thread_limits(threads)
+    ring = FrameRing.attach(*ring_args)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            vid, path = task
+            current[me] = vid
+            out = outs[vid % len(outs)]
+            try:
+                _decode_video(ring, free, out, vid, Path(path), frame_interval, max_frames)
+            except Exception as e:
+                out.put(('error', vid, str(e)))
+            current[me] = -1
+    finally:
+        ring.shm.close()
+
+
+def _decode_video(ring: FrameRing, free, out, vid: int, path: Path, frame_interval: float, max_frames: int) -> None:
+    cap = _read_video_capture(path)
+    header = _video_header(cap)
+    out.put(('start', vid, header))
+    shape = (header['height'], header['width'], 3)
+    held: List[int] = []  # slot acquired but not yet handed to the analyser
+
+    def acquire() -> np.ndarray:
+        held.append(free.get())
+        return ring.view(held[-1], shape)
+
+    def send(stream: str, index: int, frame: np.ndarray) -> None:
+        slot = held.pop()
+        if not np.shares_memory(frame, ring.view(slot, shape)):
+            # Decoder returned a different size than the header promised
+            if frame.nbytes > ring.slot_bytes:
+                free.put(slot)
+                raise RuntimeError(f"frame {frame.shape} larger than ring slot")
+            ring.view(slot, frame.shape)[...] = frame
+        out.put(('frame', vid, stream, index, slot, frame.shape))
+
+    try:
+        for index, frame in enumerate(_iter_sampled_frames(cap, frame_interval, max_frames, dst=acquire)):
+            send('sampled', index, frame)
+        cap.release()
+        cap = _read_video_capture(path)
+        for index in range(_early_frame_count(header['fps'])):
+            if not cap.grab():
+                break
+            ret, frame = cap.retrieve(acquire())
+            if not ret:
+                break
+            send('early', index, frame)
+    finally:
+        cap.release()
+        while held:
+            free.put(held.pop())
+    out.put(('end', vid))
+
+
+def _analyser_main(ring_args, inbox, free, results, paths: Dict[int, str], embed_crop: Optional[int], current, me: int, threads: int) -> None:
+    apply_thread_limits(threads)
+    ring = FrameRing.attach(*ring_args)
+    state: Dict[int, Dict[str, Any]] = {}
+    try:
+        while True:
+            msg = inbox.get()
+            if msg is None:
+                return
+            kind, vid = msg[0], msg[1]
+            current[me] = vid
+            if kind == 'start':
+                state[vid] = {'header': msg[2], 'sampled': _SampledFrameStats(crop=embed_crop), 'early': _EarlyMotion(), 'error': None}
+            elif kind == 'frame':
+                _, _, stream, index, slot, shape = msg
+                st = state[vid]
+                try:
+                    if st['error'] is None:
+                        frame = ring.view(slot, shape)
+                        if stream == 'sampled':
+                            st['sampled'].add(frame, index)
+                        else:
+                            st['early'].add(frame)
+                except Exception as e:
+                    st['error'] = str(e)
+                finally:
+                    free.put(slot)
+            elif kind == 'error':
+                state.pop(vid, None)
+                results.put((vid, {'error': msg[2]}))
+            elif kind == 'end':
+                st = state.pop(vid)
+                if st['error'] is not None:
+                    results.put((vid, {'error': st['error']}))
+                else:
+                    try:
+                        s = st['sampled']
+                        feats = _finalize(st['header'], s.motions, s.shot_changes, st['early'].motions, s.palette_lab,
+                                          _optional_video_features(Path(paths[vid])))
+                        feats.update(s.embed_fields())
+                        results.put((vid, feats))
+                    except Exception as e:
+                        results.put((vid, {'error': str(e)}))
+            current[me] = -1
+    finally:
+        ring.shm.close()
+
+
+def _ring_round(
+    vids: List[int],
+    paths: Dict[int, str],
+    slot_bytes: int,
+    frame_interval: float,
+    max_frames: int,
+    decoders: int,
+    analysers: int,
+    ring_bytes: int,
+    ctx,
+    embed_crop: Optional[int],
+    item_timeout: Optional[float],
+    threads: int,
+    emit: Callable[[int, Dict[str, Any]], None],
+) -> Tuple[Dict[int, str], bool]:
+    """
+    Run `vids` through one ring, calling emit(vid, feats) as each finishes.
+    Returns ({vid: 'worker_died' | 'timeout'} for videos blamed for a
+    failure, whether the round was aborted before every video finished).
+    """
+    slots = max(min(ring_bytes // slot_bytes, SLOTS_PER_PROCESS * (decoders + analysers)), 2 * decoders)
+    ring = FrameRing(slot_bytes, slots)
+    ring_args = (ring.shm.name, ring.slot_bytes, ring.slots)
+    free = ctx.Queue()
+    for i in range(slots):
+        free.put(i)
+    tasks = ctx.Queue()
+    inboxes = [ctx.Queue() for _ in range(analysers)]
+    results = ctx.Queue()
+    current = ctx.Array('i', [-1] * (decoders + analysers), lock=False)
+    procs = [ctx.Process(target=_decoder_main, daemon=True,
+                         args=(ring_args, tasks, free, inboxes, frame_interval, max_frames, current, i, threads))
+             for i in range(decoders)]
+    procs += [ctx.Process(target=_analyser_main, daemon=True,
+                          args=(ring_args, inbox, free, results, paths, embed_crop, current, decoders + j, threads))
+              for j, inbox in enumerate(inboxes)]
+    blamed: Dict[int, str] = {}
+    started: Dict[int, float] = {}
+    pending = set(vids)
+
+    def take(vid: int, feats: Dict[str, Any]) -> None:
+        if vid in pending:
+            pending.discard(vid)
+            emit(vid, feats)
+
+    try:
+        for p in procs:
+            p.start()
+        for vid in vids:
+            tasks.put((vid, paths[vid]))
+        for _ in range(decoders):
+            tasks.put(None)
+        last_check = 0.0
+        while pending:
+            try:
+                take(*results.get(timeout=POLL_INTERVAL))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if now - last_check < POLL_INTERVAL:
+                continue
+            last_check = now
+            for i in range(len(procs)):
+                if current[i] >= 0:
+                    started.setdefault(current[i], now)
+            for i, p in enumerate(procs):
+                if p.exitcode not in (None, 0) and current[i] in pending:
+                    blamed[current[i]] = 'worker_died'
+            if item_timeout is not None:
+                for vid, t0 in started.items():
+                    if vid in pending and now - t0 > item_timeout:
+                        blamed[vid] = 'timeout'
+            if blamed or any(p.exitcode not in (None, 0) for p in procs):
+                # Keep whatever finished before the failure
+                while True:
+                    try:
+                        take(*results.get_nowait())
+                    except queue.Empty:
+                        break
+                for vid in blamed:
+                    pending.discard(vid)
+                return blamed, True
+        for inbox in inboxes:
+            inbox.put(None)
+        for p in procs:
+            p.join(timeout=5)
+        return blamed, False
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.kill()
+                p.join()
+        # Undelivered slot numbers and tasks must not block interpreter exit on a queue feeder thread
+        for q in (free, tasks, results, *inboxes):
+            q.cancel_join_thread()
+            q.close()
+        ring.close()
+
+
+def extract_videos_pipelined(
+    items: List[Dict[str, Any]],
+    frame_interval: float,
+    max_frames: int,
+    decoders: int = 1,
+    analysers: int = 1,
+    ring_bytes: Optional[int] = None,
+    mp_context: Optional[str] = None,
+    embed_crop: Optional[int] = None,
+    item_timeout: Optional[float] = None,
+    threads_per_worker: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    extract_video_features for many videos with decoding and per-frame
+    analysis in separate processes, joined by a shared-memory frame ring.
+
+    Slots are sized for the largest frame in the batch; the ring holds
+    SLOTS_PER_PROCESS per process, fewer if ring_bytes (default
+    default_ring_bytes()) is smaller, but at least two per decoder. A video
+    whose decoder or analyser dies gets error='worker_died', one running
+    longer than item_timeout seconds error='timeout'; the rest are rerun on
+    a fresh ring. Returns rows like process_one (including the embed_crop
+    frames), in completion order.
+    """
+    if not items:
+        return []
+    decoders, analysers = max(decoders, 1), max(analysers, 1)
+    slot_bytes = _probe_frame_bytes(items) or 3
+    ctx = mp.get_context(mp_context)
+    paths = {i: str(it['path']) for i, it in enumerate(items)}
+    rows: List[Dict[str, Any]] = []
+    finished: set = set()
+
+    def emit(vid: int, feats: Dict[str, Any]) -> None:
+        finished.add(vid)
+        it = items[vid]
+        rows.append({'id': it['id'], 'media_type': it['media_type'], **feats})
+
+    todo = list(range(len(items)))
+    while todo:
+        blamed, aborted = _ring_round(todo, paths, slot_bytes, frame_interval, max_frames, decoders, analysers,
+                                      ring_bytes or default_ring_bytes(), ctx, embed_crop, item_timeout,
+                                      threads_per_worker, emit)
+        for vid, reason in blamed.items():
+            emit(vid, {'error': reason})
+        remaining = [vid for vid in todo if vid not in finished]
+        if aborted and len(remaining) == len(todo):
+            # A process died without a video to blame and nothing finished: do not loop forever
+            for vid in remaining:
+                emit(vid, {'error': 'worker_died'})
+            break
+        if remaining:
+            print(f"Frame ring restarted for {len(remaining)} remaining videos ({', '.join(sorted(set(blamed.values()))) or 'worker exited'})")
+        todo = remaining
+    return rows
@@ -0,0 +1,223 @@
+from __future__ import annotations
+import concurrent.futures as futures
+import json
+import os
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Bumped whenever sniff_bytes changes, so cached classifications are redone
+MANIFEST_VERSION = 2
+SNIFF_BYTES = 32
+
+# ISO BMFF major brands that are QuickTime rather than MP4
+_QUICKTIME_BRANDS = {b'qt  '}
+# HEIF stills (HEIC/AVIF): real images, but OpenCV and Pillow cannot decode them here
+_HEIF_BRANDS = (b'heic', b'heix', b'hevc', b'hevx', b'mif1', b'msf1', b'avif', b'avis')
+# BITMAPCOREHEADER, BITMAPINFOHEADER and its V2-V5 successors
+_BMP_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+
+
+def sniff_bytes(head: bytes) -> Tuple[str, str]:
+    """
+    Classify a file from its first bytes; returns (media_type, format).
+    media_type is 'image', 'video', 'unsupported' (a known media format
+    the extractors cannot read) or 'unknown'.
+    """
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image', 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image', 'jpeg'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image', 'gif'
+    if head.startswith(b'BM') and int.from_bytes(head[14:18], 'little') in _BMP_HEADER_SIZES:
+        # 'BM' alone matches plenty of text files; the DIB header size pins it down
+        return 'image', 'bmp'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image', 'webp'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video', 'avi'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in _QUICKTIME_BRANDS:
+            return 'video', 'mov'
+        if brand in _HEIF_BRANDS:
+            return 'unsupported', brand.decode('ascii', 'replace').strip()
+        return 'video', 'mp4'
+    if head[4:8] in (b'moov', b'mdat', b'wide', b'free'):
+        # Old QuickTime files without an ftyp box
+        return 'video', 'mov'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video', 'webm' if b'webm' in head else 'mkv'
+    return 'unknown', ''
+
+
+def sniff_file(path: str) -> Tuple[str, str]:
+    try:
+        with open(path, 'rb') as f:
+            return sniff_bytes(f.read(SNIFF_BYTES))
+    except OSError:
+        return 'unknown', ''
+
+
+def _scan_dir(path: str, prev: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    """Scan one directory; reuse the previous entry if its mtime is unchanged."""
+    st = os.stat(path)
+    if prev is not None and prev.get('mtime_ns') == st.st_mtime_ns:
+        return prev, False
+    old_files = prev.get('files', {}) if prev else {}
+    files: Dict[str, Dict[str, Any]] = {}
+    subdirs: List[str] = []
+    with os.scandir(path) as it:
+        for e in it:
+            # Skips .DS_Store, .gitkeep, our own manifest and other dotfiles
+            if e.name.startswith('.'):
+                continue
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    subdirs.append(e.path)
+                    continue
+                if not e.is_file():
+                    continue
+                fst = e.stat()
+            except OSError:
+                continue
+            old = old_files.get(e.name)
+            if old and old['size'] == fst.st_size and old['mtime_ns'] == fst.st_mtime_ns:
+                files[e.name] = old
+                continue
+            media_type, fmt = sniff_file(e.path)
+            files[e.name] = {'size': fst.st_size, 'mtime_ns': fst.st_mtime_ns, 'media_type': media_type, 'format': fmt}
+    return {'mtime_ns': st.st_mtime_ns, 'files': files, 'subdirs': sorted(subdirs)}, True
+
+
+def scan(root: Path, previous: Optional[Dict[str, Any]] = None, threads: int = 16) -> Dict[str, Any]:
+    """
+    Build a manifest of every file under root.
+
+    Directories are scanned concurrently with os.scandir. With a previous
+    manifest for the same root, a directory whose mtime is unchanged is not
+    listed again: only changed directories are re-read and only new or
+    modified files are sniffed. A file rewritten in place without a size or
+    mtime change in its directory is not noticed; delete the manifest to
+    force a full rescan.
+    """
+    root_s = str(Path(root).resolve())
+    prev_dirs = previous.get('dirs', {}) if previous and previous.get('root') == root_s else {}
+    dirs: Dict[str, Dict[str, Any]] = {}
+    stats = {'dirs_scanned': 0, 'dirs_reused': 0}
+    with futures.ThreadPoolExecutor(max_workers=max(threads, 1)) as ex:
+        inflight = {ex.submit(_scan_dir, root_s, prev_dirs.get(root_s)): root_s}
+        while inflight:
+            done, _ = futures.wait(inflight, return_when=futures.FIRST_COMPLETED)
+            for fut in done:
+                d = inflight.pop(fut)
+                try:
+                    entry, scanned = fut.result()
+                except OSError:
+                    # Vanished or unreadable directory
+                    continue
+                dirs[d] = entry
+                stats['dirs_scanned' if scanned else 'dirs_reused'] += 1
+                for sub in entry['subdirs']:
+                    inflight[ex.submit(_scan_dir, sub, prev_dirs.get(sub))] = sub
+    return {'version': MANIFEST_VERSION, 'root': root_s, 'dirs': dirs, 'stats': stats}
+
+
+def load_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        m = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    return m if m.get('version') == MANIFEST_VERSION else None
+
+
+def save_manifest(manifest: Dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({k: v for k, v in manifest.items() if k != 'stats'}))
+    os.replace(tmp, path)
+
+
+def _counts(keys: List[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for k in keys:
+        counts[k] = counts.get(k, 0) + 1
+    return counts
+
+
+def item_ids(paths: List[str], root: Path) -> List[str]:
+    """
+    The file stem where it is unique; otherwise the path relative to root
+    without the extension, or with it when that still collides
+    (x/ad1.png and x/ad1.mp4 -> 'x/ad1.png', 'x/ad1.mp4').
+    """
+    rel = [Path(p).relative_to(root) for p in paths]
+    stems = _counts([r.stem for r in rel])
+    bare = _counts([r.with_suffix('').as_posix() for r in rel])
+    ids = []
+    for r in rel:
+        if stems[r.stem] == 1:
+            ids.append(r.stem)
+        elif bare[r.with_suffix('').as_posix()] == 1:
+            ids.append(r.with_suffix('').as_posix())
+        else:
+            ids.append(r.as_posix())
+    return ids
+
+
+def manifest_items(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Work items for every image/video in the manifest, sorted by path.
+    Unsupported media (HEIC/AVIF) are included so they get an error row
+    instead of silently going missing.
+    """
+    root = Path(manifest['root'])
+    entries = []
+    for d, entry in manifest['dirs'].items():
+        for name, f in entry['files'].items():
+            if f['media_type'] in ('image', 'video', 'unsupported'):
+                entries.append((os.path.join(d, name), f))
+    entries.sort(key=lambda e: e[0])
+
+    items = []
+    for (p, f), item_id in zip(entries, item_ids([p for p, _ in entries], root)):
+        items.append({
+            'id': item_id,
+            'path': p,
+            'media_type': f['media_type'],
+            'format': f['format'],
+            'size_bytes': f['size'],
+            'mtime_ns': f['mtime_ns'],
+        })
+    return items
+
+
+ZIP_STAMP = '.source-zip.json'
+
+
+def extract_zip(zip_path: Path, dest_dir: Path) -> Path:
+    """
+    Extract zip_path into dest_dir once. The zip's size and mtime are kept
+    in a stamp file (a dotfile, so the scanner skips it); a later call with
+    the same zip reuses the extraction, so its mtimes, and with them the
+    manifest, stay valid. A changed zip replaces the extraction.
+    """
+    st = zip_path.stat()
+    source = {'zip': str(zip_path.resolve()), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    stamp = dest_dir / ZIP_STAMP
+    try:
+        if json.loads(stamp.read_text()) == source:
+            return dest_dir
+    except (OSError, ValueError):
+        pass
+    if dest_dir.exists():
+        print(f"{zip_path} changed since it was extracted; extracting it again")
+        shutil.rmtree(dest_dir)
+    dest_dir.mkdir(parents=True)
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        zf.extractall(dest_dir)
+    stamp.write_text(json.dumps(source))
+    return dest_dir
@@ -1,15 +1,24 @@
 from __future__ import annotations
-import concurrent.futures as futures
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .extractors.image_basic import extract_image_features
-from .extractors.video_basic import extract_video_features
+from .extractors.image_batch import extract_image_features_batch
+from .extractors.video_basic import (
+    extract_video_features,
+    extract_video_segment,
+    merge_video_segments,
+    plan_video_segments,
+)
+from .frame_ring import extract_videos_pipelined
+from .resources import AdaptiveController, ResourcePlan, apply_thread_limits
+from .workers import PoolLimits, SupervisedPool, TaskFailure
 
 
-MEDIA_IMAGE = {'png', 'jpg', 'jpeg'}
-MEDIA_VIDEO = {'mp4'}
+MEDIA_IMAGE = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
+MEDIA_VIDEO = {'mp4', 'm4v', 'mov', 'avi', 'mkv', 'webm'}
 
 
 def detect_media_type(suffix: str) -> str:
@@ -28,16 +37,22 @@ class WorkItem:
     media_type: str
 
 
-def process_one(item: Dict[str, Any], frame_interval: float, max_frames: int) -> Dict[str, Any]:
+def process_one(
+    item: Dict[str, Any],
+    frame_interval: float,
+    max_frames: int,
+    embed_crop: Optional[int] = None,
+    image_palette: bool = False,
+) -> Dict[str, Any]:
     pid = item['id']
     p = Path(item['path'])
     media_type = item['media_type']
     out: Dict[str, Any] = {'id': pid, 'media_type': media_type}
     try:
         if media_type == 'image':
-            out.update(extract_image_features(p))
+            out.update(extract_image_features(p, palette=image_palette))
         elif media_type == 'video':
-            out.update(extract_video_features(p, frame_interval=frame_interval, max_frames=max_frames))
+            out.update(extract_video_features(p, frame_interval=frame_interval, max_frames=max_frames, embed_crop=embed_crop))
         else:
             out['error'] = 'unsupported_media'
     except Exception as e:
@@ -45,13 +60,180 @@ def process_one(item: Dict[str, Any], frame_interval: float, max_frames: int) ->
     return out
 
 
-def process_paths_parallel(items: List[Dict[str, Any]], workers: int, frame_interval: float, max_frames: int) -> List[Dict[str, Any]]:
+def process_image_batch(items: List[Dict[str, Any]], image_palette: bool = False) -> List[Dict[str, Any]]:
+    feats = extract_image_features_batch([Path(it['path']) for it in items], palette=image_palette)
+    return [{'id': it['id'], 'media_type': it['media_type'], **f} for it, f in zip(items, feats)]
+
+
+def _run_task(
+    kind: str,
+    item: Any,
+    frame_interval: float,
+    max_frames: int,
+    spec: Optional[Dict[str, Any]],
+    embed_crop: Optional[int] = None,
+    image_palette: bool = False,
+) -> Any:
+    if kind == 'segment':
+        return extract_video_segment(Path(item['path']), frame_interval, spec, embed_crop)
+    if kind == 'image_batch':
+        return process_image_batch(item, image_palette)
+    return process_one(item, frame_interval, max_frames, embed_crop, image_palette)
+
+
+def _plan_tasks(
+    items: List[Dict[str, Any]],
+    frame_interval: float,
+    max_frames: int,
+    split_video_sec: Optional[float],
+    image_batch: int = 0,
+    embed_crop: Optional[int] = None,
+    image_palette: bool = False,
+):
+    tasks = []
+    owners: List[int] = []
+    plans: Dict[int, Dict[str, Any]] = {}
+    batches: Dict[int, List[int]] = {}
+    if image_batch > 1:
+        images = [i for i, it in enumerate(items) if it['media_type'] == 'image']
+        for b in range(0, len(images), image_batch):
+            idxs = images[b:b + image_batch]
+            batches[len(tasks)] = idxs
+            tasks.append(('image_batch', [items[i] for i in idxs], frame_interval, max_frames, None, None, image_palette))
+            owners.append(idxs[0])
+    for i, it in enumerate(items):
+        if image_batch > 1 and it['media_type'] == 'image':
+            continue
+        plan = None
+        if split_video_sec and it['media_type'] == 'video':
+            try:
+                plan = plan_video_segments(Path(it['path']), frame_interval, max_frames, split_video_sec)
+            except Exception:
+                # Unreadable here: let the whole-item task record the error
+                plan = None
+        if plan:
+            plans[i] = {'header': plan['header'], 'pending': len(plan['segments']), 'parts': [], 'error': None}
+            for spec in plan['segments']:
+                tasks.append(('segment', it, frame_interval, max_frames, spec, embed_crop, image_palette))
+                owners.append(i)
+        else:
+            tasks.append(('item', it, frame_interval, max_frames, None, embed_crop, image_palette))
+            owners.append(i)
+    return tasks, owners, plans, batches
+
+
+def process_paths_parallel(
+    items: List[Dict[str, Any]],
+    workers: int,
+    frame_interval: float,
+    max_frames: int,
+    limits: Optional[PoolLimits] = None,
+    split_video_sec: Optional[float] = None,
+    resources: Optional[ResourcePlan] = None,
+    image_batch: int = 0,
+    video_pipeline: Optional[Tuple[int, int]] = None,
+    embed_crop: Optional[int] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    image_palette: bool = False,
+    video_ring_bytes: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run every item on a supervised worker pool.
+
+    With split_video_sec, videos longer than that are cut into time segments
+    that run as separate tasks on different workers, and the partial
+    statistics are merged back into a single row.
+
+    With a ResourcePlan, workers get its per-worker thread limit, image and
+    video tasks are capped separately, and (if the plan is adaptive) the
+    pool is resized while it runs; `workers` is then ignored.
+
+    With image_batch > 1, images are sent to workers in groups of that many
+    and computed together (extractors.image_batch); a timeout or crash then
+    fails the whole group.
+
+    With video_pipeline=(decoders, analysers), videos skip the pool and go
+    through the two-stage shared-memory pipeline in frame_ring instead, once
+    the pool has finished the images: both size themselves to the cores, so
+    running them side by side would oversubscribe. The ring's shared memory
+    is capped at video_ring_bytes. Of the per-item limits only item_timeout
+    applies there, and videos are not split into segments.
+
+    With embed_crop, video rows come back from the workers carrying their
+    sampled frames as embed_crop x embed_crop crops (`_embed_frames`,
+    `_embed_shots`); on_result is called with every finished row as it
+    arrives (in this process, between pool events, so it should only hand
+    the frames off, as video_embedding.VideoEmbedder.add does). They are
+    dropped from the returned rows either way.
+
+    image_palette adds the dominant-colour palette to image rows (videos
+    always get theirs; one k-means per video is small next to decoding).
+    """
     results: List[Dict[str, Any]] = []
-    with futures.ProcessPoolExecutor(max_workers=workers) as ex:
-        futs = [
-            ex.submit(process_one, it, frame_interval, max_frames)
-            for it in items
-        ]
-        for f in futures.as_completed(futs):
-            results.append(f.result())
+
+    def emit(row: Dict[str, Any]) -> None:
+        if on_result is not None:
+            on_result(row)
+        row.pop('_embed_frames', None)
+        row.pop('_embed_shots', None)
+        results.append(row)
+
+    if video_pipeline:
+        videos = [it for it in items if it['media_type'] == 'video']
+        items = [it for it in items if it['media_type'] != 'video']
+    tasks, owners, plans, batches = _plan_tasks(items, frame_interval, max_frames, split_video_sec, image_batch, embed_crop, image_palette)
+    if resources is None:
+        pool = SupervisedPool(_run_task, workers, limits)
+    else:
+        pool = SupervisedPool(
+            _run_task,
+            resources.workers,
+            limits,
+            initializer=partial(apply_thread_limits, resources.threads_per_worker),
+            class_limits=resources.class_limits(),
+            controller=AdaptiveController(resources) if resources.adaptive else None,
+        )
+    classes = ['video' if kind == 'segment' or (kind == 'item' and it['media_type'] == 'video') else 'image' for kind, it, *_ in tasks]
+    for idx, res in pool.imap_unordered(tasks, classes):
+        if idx in batches:
+            if isinstance(res, TaskFailure):
+                res = [{'id': items[i]['id'], 'media_type': items[i]['media_type'], 'error': res.reason} for i in batches[idx]]
+            for row in res:
+                emit(row)
+            continue
+        i = owners[idx]
+        it = items[i]
+        if i in plans:
+            plan = plans[i]
+            plan['pending'] -= 1
+            if isinstance(res, TaskFailure):
+                plan['error'] = plan['error'] or res.reason
+            else:
+                plan['parts'].append(res)
+            if plan['pending']:
+                continue
+            out: Dict[str, Any] = {'id': it['id'], 'media_type': it['media_type']}
+            if plan['error']:
+                out['error'] = plan['error']
+            else:
+                out.update(merge_video_segments(plan['header'], plan['parts']))
+            emit(out)
+            continue
+        if isinstance(res, TaskFailure):
+            res = {'id': it['id'], 'media_type': it['media_type'], 'error': res.reason}
+        emit(res)
+    if video_pipeline:
+        decoders, analysers = video_pipeline
+        for row in extract_videos_pipelined(
+            videos,
+            frame_interval,
+            max_frames,
+            decoders=decoders,
+            analysers=analysers,
+            ring_bytes=video_ring_bytes,
+            embed_crop=embed_crop,
+            item_timeout=limits.item_timeout if limits else None,
+            threads_per_worker=resources.threads_per_worker if resources else 1,
+        ):
+            emit(row)
     return results
@@ -0,0 +1,282 @@
+from __future__ import annotations
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .utils import try_import
+
+
+# CPU/memory budget for the worker pool. Parallelism comes from processes,
+# so each worker's native thread pools (OpenCV, BLAS/OpenMP, torch, the
+# FFmpeg decoder) are capped to a small share of the cores instead of every
+# worker spinning up one thread per core.
+
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+
+# Rough steady-state RSS per worker, used to cap pool sizes by free memory
+IMAGE_WORKER_MEM = 256 * 1024 * 1024
+VIDEO_WORKER_MEM = 512 * 1024 * 1024
+MEM_HEADROOM = 0.8
+# Extra workers (as a fraction of one per core) the adaptive controller may
+# add on top of the initial pool, for workers that wait on I/O
+IO_EXTRA_FRACTION = 0.5
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask, further capped by a cgroup v2 CPU quota."""
+    try:
+        n = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        n = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            n = min(n, max(int(int(quota) / int(period)), 1))
+    except (OSError, ValueError):
+        pass
+    return max(n, 1)
+
+
+def mem_available() -> Optional[int]:
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    psutil = try_import('psutil')
+    if psutil is None:
+        return None
+    return int(psutil.virtual_memory().available)
+
+
+class CpuSampler:
+    """System-wide busy fraction between consecutive sample() calls (/proc/stat, loadavg fallback)."""
+
+    def __init__(self, cpus: int):
+        self.cpus = cpus
+        self._last = self._read()
+
+    @staticmethod
+    def _read() -> Optional[Tuple[int, int]]:
+        try:
+            with open('/proc/stat') as f:
+                vals = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle = vals[3] + (vals[4] if len(vals) > 4 else 0)
+        return sum(vals), idle
+
+    def sample(self) -> Optional[float]:
+        cur = self._read()
+        prev, self._last = self._last, cur
+        if cur is not None and prev is not None and cur[0] > prev[0]:
+            return 1.0 - (cur[1] - prev[1]) / float(cur[0] - prev[0])
+        try:
+            return min(os.getloadavg()[0] / self.cpus, 1.0)
+        except (AttributeError, OSError):
+            return None
+
+
+def apply_thread_limits(threads: int) -> None:
+    """
+    Cap native thread pools in the current process. Environment variables
+    cover libraries not loaded yet (and the FFmpeg decoder, which reads its
+    options when a capture is opened); already-loaded ones are set directly.
+    """
+    n = str(max(int(threads), 1))
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = n
+    os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = f"threads;{n}"
+    try:
+        import cv2
+
+        cv2.setNumThreads(int(n))
+    except Exception:
+        pass
+    if 'torch' in sys.modules:
+        try:
+            sys.modules['torch'].set_num_threads(int(n))
+        except Exception:
+            pass
+    # numpy's BLAS was loaded (and sized its pool) before this process forked
+    threadpoolctl = try_import('threadpoolctl')
+    if threadpoolctl is not None:
+        threadpoolctl.threadpool_limits(int(n))
+
+
+@dataclass
+class ResourcePlan:
+    cpus: int
+    workers: int              # initial pool size
+    max_workers: int          # ceiling for the adaptive controller
+    image_workers: int        # max concurrent image tasks
+    video_workers: int        # max concurrent video/segment tasks
+    threads_per_worker: int
+    mem_available: Optional[int]
+    adaptive: bool
+
+    def class_limits(self) -> Dict[str, int]:
+        return {'image': self.image_workers, 'video': self.video_workers}
+
+    def describe(self) -> str:
+        mem = f"{self.mem_available / 2**20:.0f} MB" if self.mem_available else 'unknown'
+        return (
+            f"Resource plan: cpus={self.cpus} workers={self.workers} (max {self.max_workers}) "
+            f"image_workers={self.image_workers} video_workers={self.video_workers} "
+            f"threads_per_worker={self.threads_per_worker} mem_available={mem} "
+            f"adaptive={'on' if self.adaptive else 'off'}\n"
+            f"  reproduce with: --workers {self.workers} --image-workers {self.image_workers} "
+            f"--video-workers {self.video_workers} --threads-per-worker {self.threads_per_worker}"
+            f"{'' if self.adaptive else ' --no-adaptive'}"
+        )
+
+
+def plan_resources(
+    workers: Optional[int] = None,
+    image_workers: Optional[int] = None,
+    video_workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    adaptive: bool = True,
+    cpus: Optional[int] = None,
+) -> ResourcePlan:
+    """
+    Pick pool sizes and per-worker thread counts. Explicit arguments win;
+    the rest default to one single-threaded worker per available CPU, with
+    the image and video caps further limited by free memory. With `adaptive`
+    the pool may grow to max_workers, IO_EXTRA_FRACTION above one worker
+    per core, but the controller only adds workers while cores sit idle.
+    """
+    cpus = cpus or available_cpus()
+    threads = max(int(threads_per_worker or 1), 1)
+    if workers is None:
+        workers = max(cpus // threads, 1)
+    elif threads_per_worker is None:
+        threads = max(cpus // max(workers, 1), 1)
+    workers = max(int(workers), 1)
+    avail = mem_available()
+
+    def mem_cap(per_worker: int) -> int:
+        if avail is None:
+            return max_workers
+        return max(int(avail * MEM_HEADROOM // per_worker), 1)
+
+    # Workers blocked on I/O (slow disks, network mounts) leave cores idle; the
+    # headroom above one worker per core lets the controller fill them
+    per_core = max(cpus // threads, 1)
+    max_workers = max(workers, per_core) + max(int(per_core * IO_EXTRA_FRACTION), 1) if adaptive else workers
+    image_cap = image_workers if image_workers is not None else min(max_workers, mem_cap(IMAGE_WORKER_MEM))
+    video_cap = video_workers if video_workers is not None else min(max_workers, mem_cap(VIDEO_WORKER_MEM))
+    return ResourcePlan(
+        cpus=cpus,
+        workers=workers,
+        max_workers=max_workers,
+        image_workers=max(int(image_cap), 1),
+        video_workers=max(int(video_cap), 1),
+        threads_per_worker=threads,
+        mem_available=avail,
+        adaptive=adaptive,
+    )
+
+
+class AdaptiveController:
+    """
+    Resizes a SupervisedPool while it runs, one worker at a time.
+
+    Every `interval` seconds it compares completed items per second with the
+    previous window. Workers are removed when free memory drops below
+    `mem_floor`, when the last scale-up made throughput worse, or when the
+    pool has more workers than cores, the CPU is saturated and throughput
+    is flat (oversubscribed). They are added while the CPU has headroom and
+    tasks are queued. After a reverted scale-up it holds for a few windows
+    so it does not oscillate.
+    """
+
+    def __init__(
+        self,
+        plan: ResourcePlan,
+        interval: float = 5.0,
+        cpu_target: float = 0.85,
+        mem_floor: Optional[int] = None,
+        min_workers: int = 1,
+        log: Callable[[str], None] = print,
+    ):
+        self.plan = plan
+        self.interval = interval
+        self.cpu_target = cpu_target
+        self.mem_floor = mem_floor if mem_floor is not None else 2 * VIDEO_WORKER_MEM
+        self.min_workers = min_workers
+        self.log = log
+        self.cpu = CpuSampler(plan.cpus)
+        self.per_core = max(plan.cpus // plan.threads_per_worker, 1)
+        self.history: List[Dict[str, Any]] = []
+        self._t0 = time.monotonic()
+        self._t_last = self._t0
+        self._done = 0
+        self._done_last = 0
+        self._last_rate: Optional[float] = None
+        self._last_move = 0
+        self._hold = 0
+
+    def update(self, pool, completed: int, backlog: int) -> None:
+        self._done += completed
+        now = time.monotonic()
+        if now - self._t_last < self.interval:
+            return
+        rate = (self._done - self._done_last) / (now - self._t_last)
+        busy = self.cpu.sample()
+        avail = mem_available()
+        self._t_last, self._done_last = now, self._done
+
+        size = pool.size
+        new, reason = size, ''
+        if avail is not None and avail < self.mem_floor and size > self.min_workers:
+            new, reason = size - 1, 'low free memory'
+        elif self._last_move > 0 and self._last_rate is not None and rate < 0.95 * self._last_rate and size > self.min_workers:
+            new, reason = size - 1, 'throughput fell after scale-up'
+            self._hold = 3
+        elif self._hold:
+            self._hold -= 1
+        elif (
+            size > max(self.per_core, self.min_workers)
+            and busy is not None and busy > self.cpu_target
+            and self._last_rate is not None and rate < 1.05 * self._last_rate
+        ):
+            new, reason = size - 1, 'cpu saturated, throughput flat'
+            self._hold = 3
+        elif (
+            size < self.plan.max_workers
+            and backlog > size
+            and busy is not None and busy < self.cpu_target
+            and (avail is None or avail > self.mem_floor + VIDEO_WORKER_MEM)
+        ):
+            new, reason = size + 1, 'cpu headroom'
+
+        self._last_move = new - size
+        self._last_rate = rate
+        if new == size:
+            return
+        pool.size = new
+        pool.class_limits = {k: min(v, new) for k, v in self.plan.class_limits().items()}
+        entry = {
+            't': round(now - self._t0, 1),
+            'workers': new,
+            'reason': reason,
+            'items_per_sec': round(rate, 3),
+            'cpu_busy': None if busy is None else round(busy, 3),
+            'mem_available': avail,
+        }
+        self.history.append(entry)
+        cpu = 'n/a' if busy is None else f"{busy:.0%}"
+        mem = 'n/a' if avail is None else f"{avail / 2**20:.0f} MB"
+        self.log(f"Resource controller: workers {size} -> {new} ({reason}; {rate:.2f} items/s, cpu {cpu}, mem available {mem})")
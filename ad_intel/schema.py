@@ -0,0 +1,310 @@
+from __future__ import annotations
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+# Declared output columns, in output order. Every column is nullable except
+# id/media_type: image rows have no video columns, and optional extractors
+# (OCR, CLIP, audio, LLM annotation) only fill theirs when available.
+COLUMNS: Dict[str, str] = {
+    'id': 'string',
+    'media_type': 'category',
+    'error': 'string',
+    # common geometry
+    'width': 'uint16',
+    'height': 'uint16',
+    'aspect_ratio': 'float32',
+    # image
+    'mean_r': 'float32',
+    'mean_g': 'float32',
+    'mean_b': 'float32',
+    'std_r': 'float32',
+    'std_g': 'float32',
+    'std_b': 'float32',
+    'brightness': 'float32',
+    'saturation_proxy': 'float32',
+    'colorfulness': 'float32',
+    'edge_density': 'float32',
+    'text_area_ratio': 'float32',
+    'clip_dim': 'uint16',
+    # video
+    'fps': 'float32',
+    'duration_sec': 'float32',
+    'frame_count': 'uint32',
+    'avg_motion': 'float32',
+    'shot_changes': 'uint16',
+    'early_action_ratio': 'float32',
+    'audio_loudness': 'float32',
+    'audio_tempo_bpm': 'float32',
+    # dominant-colour palette (extractors/palette.py, PALETTE_K = 5)
+    'palette_0_l': 'float32',
+    'palette_0_a': 'float32',
+    'palette_0_b': 'float32',
+    'palette_0_share': 'float32',
+    'palette_1_l': 'float32',
+    'palette_1_a': 'float32',
+    'palette_1_b': 'float32',
+    'palette_1_share': 'float32',
+    'palette_2_l': 'float32',
+    'palette_2_a': 'float32',
+    'palette_2_b': 'float32',
+    'palette_2_share': 'float32',
+    'palette_3_l': 'float32',
+    'palette_3_a': 'float32',
+    'palette_3_b': 'float32',
+    'palette_3_share': 'float32',
+    'palette_4_l': 'float32',
+    'palette_4_a': 'float32',
+    'palette_4_b': 'float32',
+    'palette_4_share': 'float32',
+    # company / transcript
+    'company_name': 'string',
+    'has_company_name': 'bool',
+    'company_name_length': 'uint16',
+    'transcript': 'string',
+    'has_speech': 'bool',
+    'word_count': 'uint32',
+    'sentence_count': 'uint32',
+    'avg_words_per_sentence': 'float32',
+    'transcript_length': 'uint32',
+    'ad_keyword_count': 'uint32',
+    'ad_keyword_density': 'float32',
+    'has_call_to_action': 'bool',
+    # LLM annotation (ad_intel.annotation)
+    'transcription': 'string',
+    'video_length': 'float32',
+    'music_theme': 'category',
+    'company_industry': 'category',
+    'call_to_action': 'string',
+    'brand_logo': 'float32',
+    'cuts': 'uint16',
+    'product': 'string',
+    'product_display_count': 'uint16',
+    'llm_error': 'string',
+    # embeddings
+    'clip_embedding': 'embedding',
+    'image_embedding': 'embedding',
+    'video_embedding': 'embedding',
+    'video_embedding_max': 'embedding',
+    'video_embedding_early': 'embedding',
+    'shot_embeddings': 'embedding_list',
+    'embed_frames': 'uint16',
+    'embed_error': 'string',
+}
+
+NOT_NULL = {'id', 'media_type'}
+
+INT_RANGES = {'uint16': (0, 2**16 - 1), 'uint32': (0, 2**32 - 1), 'int64': (-2**63, 2**63 - 1)}
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+# Default vector length for each embedding column. The backbone behind
+# image_embedding (service) and the video columns is chosen per run, so
+# writers pass its width in `embedding_dims`.
+EMBEDDING_DIMS: Dict[str, int] = {
+    'clip_embedding': 512,
+    # ResNet-50 pooled features
+    'image_embedding': 2048,
+    'video_embedding': 2048,
+    'video_embedding_max': 2048,
+    'video_embedding_early': 2048,
+    'shot_embeddings': 2048,
+}
+
+BACKBONE_EMBEDDING_COLUMNS = ('image_embedding', 'video_embedding', 'video_embedding_max', 'video_embedding_early', 'shot_embeddings')
+
+
+def backbone_embedding_dims(dim: int) -> Dict[str, int]:
+    """`embedding_dims` for a run whose backbone outputs `dim` values (ResNet-50: 2048, CLIP ViT-B/32: 512)."""
+    return {name: int(dim) for name in BACKBONE_EMBEDDING_COLUMNS}
+
+
+def _dims(embedding_dims: Optional[Dict[str, int]]) -> Dict[str, int]:
+    return {**EMBEDDING_DIMS, **(embedding_dims or {})}
+
+
+def _arrow_type(kind: str, name: str, dims: Dict[str, int] = EMBEDDING_DIMS):
+    import pyarrow as pa
+
+    simple = {
+        'string': pa.string(),
+        'bool': pa.bool_(),
+        'float32': pa.float32(),
+        'float64': pa.float64(),
+        'uint16': pa.uint16(),
+        'uint32': pa.uint32(),
+        'int64': pa.int64(),
+    }
+    if kind in simple:
+        return simple[kind]
+    if kind == 'category':
+        return pa.dictionary(pa.int16(), pa.string())
+    if kind == 'embedding':
+        return pa.list_(pa.float32(), dims[name])
+    if kind == 'embedding_list':
+        return pa.list_(pa.list_(pa.float32(), dims[name]))
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def arrow_schema(extra: Optional[Dict[str, Any]] = None, embedding_dims: Optional[Dict[str, int]] = None):
+    import pyarrow as pa
+
+    dims = _dims(embedding_dims)
+    fields = [pa.field(name, _arrow_type(kind, name, dims), nullable=name not in NOT_NULL) for name, kind in COLUMNS.items()]
+    for name, typ in (extra or {}).items():
+        fields.append(pa.field(name, typ, nullable=True))
+    return pa.schema(fields)
+
+
+def _is_missing(v: Any) -> bool:
+    if v is None:
+        return True
+    if isinstance(v, (float, np.floating)) and np.isnan(v):
+        return True
+    # Legacy empty-string placeholders are stored as null
+    return isinstance(v, str) and v == ''
+
+
+def _coerce(kind: str, name: str, v: Any, dims: Dict[str, int] = EMBEDDING_DIMS) -> Any:
+    """Convert one non-missing value for a declared column; raises ValueError/TypeError/OverflowError if it does not fit."""
+    if kind in INT_RANGES:
+        if isinstance(v, (int, np.integer)):
+            i = int(v)
+        else:
+            f = float(v)
+            if not (math.isfinite(f) and f.is_integer()):
+                raise ValueError(v)
+            i = int(f)
+        lo, hi = INT_RANGES[kind]
+        if not lo <= i <= hi:
+            raise OverflowError(v)
+        return i
+    if kind in ('float32', 'float64'):
+        f = float(v)
+        if kind == 'float32' and math.isfinite(f) and abs(f) > FLOAT32_MAX:
+            raise OverflowError(v)
+        return f
+    if kind == 'bool':
+        return bool(v)
+    if kind in ('string', 'category'):
+        return str(v)
+    dim = dims[name]
+    if kind == 'embedding':
+        vec = np.asarray(v, dtype=np.float32).reshape(-1)
+        if vec.shape[0] != dim:
+            raise ValueError(f"expected {dim} values, got {vec.shape[0]}")
+        return vec
+    return list(np.asarray(v, dtype=np.float32).reshape(-1, dim))
+
+
+def _warn_dropped(name: str, kind: str, bad: List[Any]) -> None:
+    shown = ', '.join(repr(v)[:40] for v in bad[:3])
+    print(f"Schema warning: {name}: {len(bad)} value(s) do not fit {kind} and were written as null (e.g. {shown})")
+
+
+def _column_array(name: str, kind: str, values: List[Any], dims: Dict[str, int] = EMBEDDING_DIMS):
+    import pyarrow as pa
+
+    typ = _arrow_type(kind, name, dims)
+    cleaned: List[Any] = []
+    bad: List[Any] = []
+    vector = kind in ('embedding', 'embedding_list')
+    for v in values:
+        missing = (v is None or (isinstance(v, float) and np.isnan(v))) if vector else _is_missing(v)
+        if missing:
+            cleaned.append(None)
+            continue
+        try:
+            cleaned.append(_coerce(kind, name, v, dims))
+        except (ValueError, TypeError, OverflowError):
+            # One bad value (e.g. a garbage cv2 frame count) must not lose the whole run's output
+            bad.append(v)
+            cleaned.append(None)
+    if bad:
+        _warn_dropped(name, kind, bad)
+    if kind == 'category':
+        return pa.array(cleaned, type=pa.string()).dictionary_encode().cast(typ)
+    return pa.array(cleaned, type=typ)
+
+
+def _extra_array(name: str, values: List[Any]):
+    import pyarrow as pa
+
+    cleaned = [None if _is_missing(v) else v for v in values]
+    try:
+        arr = pa.array(cleaned, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        print(f"Schema warning: undeclared column {name} has mixed value types; written as strings")
+        return pa.array([None if v is None else str(v) for v in cleaned], type=pa.string())
+    if pa.types.is_float64(arr.type):
+        arr = arr.cast(pa.float32())
+    return arr
+
+
+def to_arrow_table(rows: List[Dict[str, Any]], embedding_dims: Optional[Dict[str, int]] = None):
+    """
+    Build a table with the declared schema; undeclared keys are appended
+    with inferred types (strings when mixed). Values that do not fit their
+    column are written as null with a printed warning instead of raising.
+    `embedding_dims` overrides EMBEDDING_DIMS for this table (see backbone_embedding_dims).
+    """
+    import pyarrow as pa
+
+    dims = _dims(embedding_dims)
+    arrays = []
+    names = []
+    for name, kind in COLUMNS.items():
+        arrays.append(_column_array(name, kind, [r.get(name) for r in rows], dims))
+        names.append(name)
+    extras: List[str] = []
+    for r in rows:
+        for k in r:
+            if k not in COLUMNS and k not in extras:
+                extras.append(k)
+    extra_types = {}
+    for k in extras:
+        arr = _extra_array(k, [r.get(k) for r in rows])
+        arrays.append(arr)
+        names.append(k)
+        extra_types[k] = arr.type
+    return pa.Table.from_arrays(arrays, schema=arrow_schema(extra_types, dims))
+
+
+def conform_table(table):
+    """Cast a table read back from disk onto the declared schema (used when merging parts)."""
+    import pyarrow as pa
+
+    declared = arrow_schema()
+    cols = []
+    for field in declared:
+        if field.name in table.column_names:
+            col = table.column(field.name)
+            # Embedding widths depend on the backbone used for the run; keep what was written
+            if COLUMNS[field.name] in ('embedding', 'embedding_list'):
+                cols.append(col)
+            else:
+                cols.append(col.cast(field.type))
+        else:
+            cols.append(pa.nulls(table.num_rows, type=field.type))
+    names = [f.name for f in declared]
+    for name in table.column_names:
+        if name not in COLUMNS:
+            cols.append(table.column(name))
+            names.append(name)
+    return pa.Table.from_arrays(cols, names=names)
+
+
+def write_parquet(table, path: Path) -> None:
+    import pyarrow.parquet as pq
+
+    pq.write_table(table, path, compression='zstd', use_dictionary=True)
+
+
+def write_csv(table, path: Path) -> None:
+    import pyarrow as pa
+
+    # Vectors do not fit in CSV cells; store them in Parquet instead
+    keep = [f.name for f in table.schema if not (pa.types.is_fixed_size_list(f.type) or pa.types.is_list(f.type))]
+    table.select(keep).to_pandas().to_csv(path, index=False)
@@ -0,0 +1,311 @@
+from __future__ import annotations
+import concurrent.futures as futures
+import json
+import math
+import os
+import queue
+import socketserver
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .pipeline import detect_media_type, process_one
+from .resources import apply_thread_limits
+from .workers import PersistentPool, PoolLimits, TaskFailure
+
+
+# Long-lived extraction daemon: a warm PersistentPool for the per-item
+# features plus (optionally) one embedding model in this process, fed by a
+# micro-batcher so concurrent requests share backbone batches. Results are
+# streamed back as NDJSON, one line per item, as soon as each item is done.
+
+def warm_worker(threads: int = 1) -> None:
+    # Pay imports and optional model loads once per worker, not per request
+    apply_thread_limits(threads)
+    import cv2  # noqa: F401
+    from PIL import Image  # noqa: F401
+    from .extractors import image_basic, video_basic  # noqa: F401
+    try:
+        from .extractors.clip_optional import clip_embed_dim
+        clip_embed_dim()
+    except Exception:
+        pass
+    try:
+        from .extractors.ocr_optional import _easyocr_reader
+        _easyocr_reader()
+    except Exception:
+        pass
+
+
+class MicroBatcher:
+    """
+    Coalesces frame arrays submitted from many threads into one model call.
+
+    A batch is flushed once it holds max_batch frames or the oldest request
+    has waited max_wait seconds, whichever comes first.
+    """
+
+    def __init__(self, fn: Callable[[np.ndarray], np.ndarray], max_batch: int = 64, max_wait: float = 0.01):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._q: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, frames: np.ndarray) -> futures.Future:
+        fut: futures.Future = futures.Future()
+        self._q.put((frames, fut))
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is None:
+                return
+            batch = [first]
+            n = len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            while n < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    nxt = self._q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._q.put(None)
+                    break
+                batch.append(nxt)
+                n += len(nxt[0])
+            try:
+                emb = self.fn(np.concatenate([fr for fr, _ in batch]))
+                off = 0
+                for fr, fut in batch:
+                    fut.set_result(emb[off:off + len(fr)])
+                    off += len(fr)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+
+    def close(self) -> None:
+        self._q.put(None)
+        self._thread.join()
+
+
+def _jsonable(v: Any) -> Any:
+    if isinstance(v, np.ndarray):
+        return v.astype(float).tolist()
+    if isinstance(v, (list, tuple)):
+        return [_jsonable(x) for x in v]
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    return v
+
+
+class ExtractionService:
+    def __init__(
+        self,
+        workers: int,
+        frame_interval: float = 0.5,
+        max_frames: int = 120,
+        limits: Optional[PoolLimits] = None,
+        embed_model: Optional[str] = None,
+        embed_batch_size: int = 64,
+        embed_max_wait: float = 0.01,
+        decode_threads: int = 4,
+        threads_per_worker: int = 1,
+        image_palette: bool = False,
+    ):
+        self.frame_interval = frame_interval
+        self.image_palette = image_palette
+        self.max_frames = max_frames
+        self.pool = PersistentPool(process_one, workers, limits, initializer=partial(warm_worker, threads_per_worker)).start()
+        self.decoders = futures.ThreadPoolExecutor(max_workers=max(decode_threads, 1), thread_name_prefix='embed-decode')
+        self.batcher: Optional[MicroBatcher] = None
+        if embed_model:
+            from .feature_extractor import ImageFeatureExtractor
+
+            extractor = ImageFeatureExtractor(model_name=embed_model)
+            self.batcher = MicroBatcher(lambda fr: extractor.embed_arrays(fr, batch_size=embed_batch_size), embed_batch_size, embed_max_wait)
+        self.started = time.time()
+        self.served = 0
+
+    def _embed(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        from .video_embedding import resize_center_crop, sample_video_frames, temporal_pool
+
+        assert self.batcher is not None
+        path = Path(item['path'])
+        if item['media_type'] == 'video':
+            frames, times, _ = sample_video_frames(path, self.frame_interval, self.max_frames)
+            if len(frames) == 0:
+                return {'embed_frames': 0, 'embed_error': 'no_frames'}
+            emb = self.batcher.submit(frames).result()
+            pooled = temporal_pool(emb, times)
+            return {
+                'embed_frames': int(len(frames)),
+                'video_embedding': pooled['mean'],
+                'video_embedding_max': pooled['max'],
+                'video_embedding_early': pooled['early'],
+            }
+        import cv2
+
+        bgr = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if bgr is None:
+            return {'embed_error': 'unreadable'}
+        frame = resize_center_crop(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+        return {'image_embedding': self.batcher.submit(frame[None]).result()[0]}
+
+    def extract(self, items: List[Dict[str, Any]], embed: bool = False):
+        """Yield one result dict per item, in completion order."""
+        pending: Dict[futures.Future, Dict[str, Any]] = {}
+        for it in items:
+            fut = self.pool.submit(it, self.frame_interval, self.max_frames, None, self.image_palette)
+            pending[fut] = {'item': it}
+            if embed and self.batcher is not None and it['media_type'] in ('image', 'video'):
+                # Decode + embed in this process while the pool computes the scalar features
+                pending[fut]['emb_future'] = self.decoders.submit(self._embed, it)
+        for fut in futures.as_completed(list(pending)):
+            st = pending[fut]
+            it = st['item']
+            res = fut.result()
+            if isinstance(res, TaskFailure):
+                res = {'id': it['id'], 'media_type': it['media_type'], 'error': res.reason}
+            efut = st.get('emb_future')
+            if efut is not None:
+                try:
+                    res.update(efut.result())
+                except Exception as e:
+                    res['embed_error'] = str(e)
+            self.served += 1
+            yield res
+
+    def health(self) -> Dict[str, Any]:
+        health = {
+            'status': 'ok' if self.pool.error is None else 'failed',
+            'workers': len(self.pool.workers),
+            'pending': self.pool.pending(),
+            'served': self.served,
+            'uptime_sec': round(time.time() - self.started, 1),
+            'embeddings': self.batcher is not None,
+            'recycled': self.pool.recycled,
+            'replaced': self.pool.replaced,
+        }
+        if self.pool.error is not None:
+            health['error'] = self.pool.error
+        return health
+
+    def close(self) -> None:
+        self.pool.shutdown()
+        self.decoders.shutdown(wait=False)
+        if self.batcher is not None:
+            self.batcher.close()
+
+
+def normalize_items(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    raw = payload.get('items')
+    if raw is None:
+        raw = [{'path': p} for p in payload.get('paths', [])]
+    items = []
+    for r in raw:
+        p = Path(r['path'])
+        items.append({
+            'id': str(r.get('id') or p.stem),
+            'path': str(p),
+            'media_type': r.get('media_type') or detect_media_type(p.suffix),
+        })
+    return items
+
+
+def _make_handler(service: ExtractionService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] == '/health':
+                health = service.health()
+                self._send_json(200 if health['status'] == 'ok' else 503, health)
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path.split('?', 1)[0] != '/extract':
+                self._send_json(404, {'error': 'not found'})
+                return
+            try:
+                n = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(n) or b'{}')
+                items = normalize_items(payload)
+            except Exception as e:
+                self._send_json(400, {'error': f"bad request: {e}"})
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for row in service.extract(items, embed=bool(payload.get('embed'))):
+                    line = json.dumps({k: _jsonable(v) for k, v in row.items()}) + '\n'
+                    self._chunk(line.encode('utf-8'))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away; its remaining items finish in the pool and are dropped
+                pass
+
+    return Handler
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        # BaseHTTPRequestHandler expects these
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def serve(service: ExtractionService, host: str = '127.0.0.1', port: int = 8080, socket_path: Optional[Path] = None) -> None:
+    handler = _make_handler(service)
+    if socket_path is not None:
+        if socket_path.exists():
+            os.unlink(socket_path)
+        server = _ThreadingUnixHTTPServer(str(socket_path), handler)
+        where = f"unix:{socket_path}"
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        where = f"http://{host}:{server.server_address[1]}"
+    print(f"Extraction service listening on {where} with {service.pool.size} warm workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if socket_path is not None and socket_path.exists():
+            os.unlink(socket_path)
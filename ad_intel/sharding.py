@@ -0,0 +1,214 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .schema import conform_table, write_parquet
+
+
+MANIFEST_VERSION = 1
+
+
+def _id_hash(item_id: str) -> int:
+    # Stable across interpreters/machines, unlike the builtin salted hash()
+    return int.from_bytes(hashlib.sha1(item_id.encode('utf-8')).digest()[:8], 'big')
+
+
+def manifest_digest(ids: List[str]) -> str:
+    h = hashlib.sha1()
+    for i in sorted(ids):
+        h.update(i.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def probe_sizes(items: List[Dict[str, Any]]) -> None:
+    for it in items:
+        if 'size_bytes' in it:
+            continue
+        try:
+            it['size_bytes'] = os.stat(it['path']).st_size
+        except OSError:
+            it['size_bytes'] = 0
+
+
+def duplicate_ids(items: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Ids shared by more than one item, with the paths that produced them."""
+    paths: Dict[str, List[str]] = {}
+    for it in items:
+        paths.setdefault(it['id'], []).append(str(it.get('path', '')))
+    return {i: p for i, p in sorted(paths.items()) if len(p) > 1}
+
+
+def _describe_duplicates(dups: Dict[str, List[str]], limit: int = 5) -> str:
+    shown = '; '.join(f"{i} <- {', '.join(p)}" for i, p in list(dups.items())[:limit])
+    more = f" (+{len(dups) - limit} more)" if len(dups) > limit else ''
+    return f"{shown}{more}"
+
+
+def partition_items(items: List[Dict[str, Any]], shard_count: int, balance: str = 'size') -> List[List[Dict[str, Any]]]:
+    """
+    Deterministically split work items into shard_count groups.
+
+    'hash' assigns each id to hash(id) % shard_count. 'size' walks items
+    by decreasing probed file size (hash of id as tie-break) and gives each
+    to the currently lightest shard, so every node computes the same plan
+    from the same manifest without coordinating.
+    """
+    if shard_count < 1:
+        raise ValueError('shard_count must be >= 1')
+    dups = duplicate_ids(items)
+    if dups:
+        # The merge requires unique ids; fail here, where the clashing paths are still known
+        raise ValueError(f"Duplicate item ids, shards could not be merged: {_describe_duplicates(dups)}")
+    shards: List[List[Dict[str, Any]]] = [[] for _ in range(shard_count)]
+    if balance == 'hash':
+        for it in items:
+            shards[_id_hash(it['id']) % shard_count].append(it)
+    elif balance == 'size':
+        probe_sizes(items)
+        loads = [0] * shard_count
+        ordered = sorted(items, key=lambda it: (-int(it['size_bytes']), _id_hash(it['id']), it['id']))
+        for it in ordered:
+            k = min(range(shard_count), key=lambda s: (loads[s], s))
+            shards[k].append(it)
+            # +1 so empty/unreadable files still spread out instead of piling on shard 0
+            loads[k] += int(it['size_bytes']) + 1
+    else:
+        raise ValueError(f"Unknown balance mode: {balance}")
+    for s in shards:
+        s.sort(key=lambda it: it['id'])
+    return shards
+
+
+def part_name(shard_index: int, shard_count: int) -> str:
+    return f"part-{shard_index:05d}-of-{shard_count:05d}"
+
+
+def write_part(
+    table,
+    out_dir: Path,
+    shard_index: int,
+    shard_count: int,
+    assigned_ids: List[str],
+    all_ids: List[str],
+) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    name = part_name(shard_index, shard_count)
+    data_path = out_dir / f"{name}.parquet"
+    tmp_path = out_dir / f".{name}.parquet.tmp"
+    write_parquet(table, tmp_path)
+    os.replace(tmp_path, data_path)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'shard_index': shard_index,
+        'shard_count': shard_count,
+        'data_file': data_path.name,
+        'rows': int(table.num_rows),
+        'assigned_ids': sorted(assigned_ids),
+        'total_items': len(all_ids),
+        'manifest_digest': manifest_digest(all_ids),
+    }
+    # Manifest is written last: its presence marks the part as complete
+    manifest_path = out_dir / f"{name}.manifest.json"
+    tmp_manifest = out_dir / f".{name}.manifest.json.tmp"
+    tmp_manifest.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_manifest, manifest_path)
+    return manifest_path
+
+
+class MergeError(RuntimeError):
+    pass
+
+
+def merge_parts(parts_dir: Path, output: Path) -> Dict[str, Any]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    manifests = sorted(parts_dir.glob('part-*.manifest.json'))
+    if not manifests:
+        raise MergeError(f"No part manifests found in {parts_dir}")
+
+    loaded = [json.loads(p.read_text()) for p in manifests]
+    counts = {m['shard_count'] for m in loaded}
+    digests = {m['manifest_digest'] for m in loaded}
+    if len(counts) != 1 or len(digests) != 1:
+        raise MergeError('Parts come from different runs (shard_count or manifest digest mismatch)')
+    shard_count = counts.pop()
+    digest = digests.pop()
+    total_items = loaded[0]['total_items']
+
+    seen_shards = [m['shard_index'] for m in loaded]
+    dup_shards = sorted({s for s in seen_shards if seen_shards.count(s) > 1})
+    missing_shards = sorted(set(range(shard_count)) - set(seen_shards))
+
+    tables = []
+    missing_ids: List[str] = []
+    unexpected_ids: List[str] = []
+    assigned_all: List[str] = []
+    for m in loaded:
+        table = conform_table(pq.read_table(parts_dir / m['data_file']))
+        assigned = set(m['assigned_ids'])
+        assigned_all.extend(m['assigned_ids'])
+        got = set(table.column('id').to_pylist())
+        missing_ids.extend(sorted(assigned - got))
+        unexpected_ids.extend(sorted(got - assigned))
+        tables.append(table)
+
+    # Undeclared extra columns may differ between parts; promote fills them with nulls
+    merged = pa.concat_tables(tables, promote_options='default')
+    dup_rows = sorted(i for i, n in Counter(merged.column('id').to_pylist()).items() if n > 1)
+    # Ids assigned more than once come from the input manifest itself, not from a re-run shard
+    dup_assigned = sorted(i for i, n in Counter(assigned_all).items() if n > 1)
+
+    report: Dict[str, Any] = {
+        'shard_count': shard_count,
+        'parts': len(loaded),
+        'rows': int(merged.num_rows),
+        'total_items': total_items,
+        'missing_shards': missing_shards,
+        'duplicate_shards': dup_shards,
+        'missing_ids': missing_ids,
+        'duplicate_ids': dup_rows,
+        'duplicate_manifest_ids': dup_assigned,
+        'unexpected_ids': unexpected_ids,
+    }
+
+    complete = not missing_shards and manifest_digest(assigned_all) == digest and len(assigned_all) == total_items
+    if dup_shards or dup_rows or dup_assigned or unexpected_ids or missing_ids or not complete:
+        raise MergeError(f"Shard merge validation failed: {_summarize(report)}")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    write_parquet(merged.sort_by('id'), output)
+    return report
+
+
+def _summarize(report: Dict[str, Any], limit: int = 5) -> str:
+    bits = []
+    for key in ('missing_shards', 'duplicate_shards', 'missing_ids', 'duplicate_ids', 'duplicate_manifest_ids', 'unexpected_ids'):
+        vals = report[key]
+        if vals:
+            shown = ', '.join(str(v) for v in vals[:limit])
+            more = f" (+{len(vals) - limit} more)" if len(vals) > limit else ''
+            bits.append(f"{key}=[{shown}]{more}")
+    if report['duplicate_manifest_ids']:
+        bits.append('ids are duplicated in the input manifest itself (two files mapped to the same id)')
+    if not bits:
+        bits.append(f"assigned ids do not cover manifest of {report['total_items']} items")
+    return '; '.join(bits)
+
+
+def shard_items(
+    items: List[Dict[str, Any]],
+    shard_index: int,
+    shard_count: int,
+    balance: str = 'size',
+) -> List[Dict[str, Any]]:
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index {shard_index} out of range for shard_count {shard_count}")
+    return partition_items(items, shard_count, balance=balance)[shard_index]
+
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import math
+import os
 from pathlib import Path
 from typing import Optional
 
@@ -52,3 +53,19 @@ def try_import(module: str) -> Optional[object]:
         return __import__(module)
     except Exception:
         return None
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    # Current resident set size; /proc on Linux, psutil elsewhere if installed
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    psutil = try_import('psutil')
+    if psutil is None:
+        return None
+    try:
+        return int(psutil.Process(pid).memory_info().rss)
+    except Exception:
+        return None
@@ -0,0 +1,239 @@
+from __future__ import annotations
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from .extractors.video_basic import (
+    _frame_hist,
+    _iter_sampled_frames,
+    _read_video_capture,
+    _shot_change,
+    resize_center_crop,
+    sample_times,
+)
+
+
+# Deep embeddings for videos. In batch runs the frames come from the video
+# feature pass itself (no second decode), cropped to 224x224 uint8 in the
+# worker, and frames from many videos share backbone batches.
+# sample_video_frames decodes on its own for the persistent service.
+
+def sample_video_frames(path: Path, frame_interval: float, max_frames: int, crop: int = 224) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (frames TxHxWx3 uint8 RGB, timestamps in seconds, shot id per frame) for one video."""
+    cap = _read_video_capture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = []
+        shots = []
+        shot = 0
+        prev_hist = None
+        for frame_bgr in _iter_sampled_frames(cap, frame_interval, max_frames):
+            frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+            hist = _frame_hist(frame_rgb)
+            if prev_hist is not None and _shot_change(prev_hist, hist):
+                shot += 1
+            prev_hist = hist
+            shots.append(shot)
+            frames.append(resize_center_crop(frame_rgb, resize=256 * crop // 224, crop=crop))
+    finally:
+        cap.release()
+    times = sample_times(fps, frame_interval, len(frames))
+    if not frames:
+        return np.zeros((0, crop, crop, 3), dtype=np.uint8), times, np.zeros(0, dtype=np.int32)
+    return np.stack(frames), times, np.asarray(shots, dtype=np.int32)
+
+
+def temporal_pool(emb: np.ndarray, times: np.ndarray, early_sec: float = 3.0) -> Dict[str, np.ndarray]:
+    """
+    Pool per-frame embeddings (T x D) into one vector per video.
+
+    'early' is attention pooling with the mean of the first `early_sec`
+    seconds as the query, so frames that look like the opening get more
+    weight.
+    """
+    emb = emb.astype(np.float32, copy=False)
+    mean = emb.mean(axis=0)
+    early_mask = times < early_sec
+    query = emb[early_mask].mean(axis=0) if early_mask.any() else emb[0]
+    logits = emb @ query / np.sqrt(emb.shape[1])
+    w = np.exp(logits - logits.max())
+    w /= w.sum()
+    return {
+        'mean': mean,
+        'max': emb.max(axis=0),
+        'early': (w[:, None] * emb).sum(axis=0),
+    }
+
+
+def shot_pool(emb: np.ndarray, shots: np.ndarray) -> List[np.ndarray]:
+    return [emb[shots == s].mean(axis=0) for s in np.unique(shots)]
+
+
+class VideoEmbedder:
+    """
+    Backbone side of --video-embeddings. Worker processes crop the frames
+    they already decode for the handcrafted video features (extract_video_features
+    with embed_crop=self.crop) and return them in the row. add() takes them
+    out of the row and queues them; a background thread feeds the backbone
+    full batches drawn from many videos, so the caller (the pool's result
+    loop) only blocks once `max_pending` videos are waiting.
+    """
+
+    def __init__(
+        self,
+        model_name: str = 'resnet50',
+        use_gpu: bool = False,
+        batch_size: int = 64,
+        per_shot: bool = False,
+        crop: int = 224,
+        max_pending: int = 8,
+    ):
+        from .feature_extractor import ImageFeatureExtractor
+
+        self.extractor = ImageFeatureExtractor(model_name=model_name, use_gpu=use_gpu)
+        self.dim = int(self.extractor.embed_dim)
+        self.batch_size = batch_size
+        self.per_shot = per_shot
+        self.crop = crop
+        self.stats: Dict[str, float] = {}
+        self._rows: List[Dict[str, Any]] = []
+        # Per video: (id, times, shots), embedded chunks so far and frames still waiting for a batch
+        self._meta: Dict[int, Tuple[Any, np.ndarray, np.ndarray]] = {}
+        self._parts: Dict[int, List[np.ndarray]] = {}
+        self._waiting: Dict[int, int] = {}
+        self._buffer: List[Tuple[int, np.ndarray]] = []
+        self._buffered = 0
+        self._videos = 0
+        self._frames = 0
+        self._model_time = 0.0
+        self._t0: Optional[float] = None
+        self._error: Optional[str] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=max(max_pending, 1))
+        self._thread: Optional[threading.Thread] = None
+
+    def _rows_for(self, item_id: Any, emb: np.ndarray, times: np.ndarray, shots: np.ndarray) -> Dict[str, Any]:
+        row: Dict[str, Any] = {'id': item_id, 'embed_frames': int(len(emb))}
+        if len(emb) == 0:
+            row['embed_error'] = 'no_frames'
+            return row
+        pooled = temporal_pool(emb, times)
+        row['video_embedding'] = pooled['mean']
+        row['video_embedding_max'] = pooled['max']
+        row['video_embedding_early'] = pooled['early']
+        if self.per_shot:
+            row['shot_embeddings'] = shot_pool(emb, shots)
+        return row
+
+    def add(self, row: Dict[str, Any], frame_interval: float) -> None:
+        """Take the sampled frames out of a finished feature row (rows without them are ignored)."""
+        frames = row.pop('_embed_frames', None)
+        shots = row.pop('_embed_shots', None)
+        if frames is None:
+            return
+        if self._thread is None:
+            self._t0 = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name='video-embedder', daemon=True)
+            self._thread.start()
+        times = sample_times(float(row.get('fps') or 0.0), frame_interval, len(frames))
+        self._queue.put((row['id'], frames, times, shots))
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            if self._error is not None:
+                self._rows.append({'id': job[0], 'embed_error': self._error})
+                continue
+            try:
+                # A video is registered before its first batch runs, so _fail covers it
+                self._take(*job)
+            except Exception as e:
+                self._fail(str(e))
+        if self._error is None:
+            try:
+                self._flush(force=True)
+            except Exception as e:
+                self._fail(str(e))
+
+    def _fail(self, error: str) -> None:
+        # The backbone failed: every video still waiting on it gets an error row
+        self._error = error
+        for item_id, _, _ in self._meta.values():
+            self._rows.append({'id': item_id, 'embed_error': error})
+        self._meta.clear()
+        self._parts.clear()
+        self._waiting.clear()
+        self._buffer, self._buffered = [], 0
+
+    def _take(self, item_id: Any, frames: np.ndarray, times: np.ndarray, shots: np.ndarray) -> None:
+        idx = self._videos
+        self._videos += 1
+        if len(frames) == 0:
+            self._rows.append(self._rows_for(item_id, frames, times, shots))
+            return
+        self._meta[idx] = (item_id, times, shots)
+        self._parts[idx] = []
+        self._waiting[idx] = len(frames)
+        self._buffer.append((idx, frames))
+        self._buffered += len(frames)
+        self._flush(force=False)
+
+    def _flush(self, force: bool) -> None:
+        while self._buffered >= self.batch_size or (force and self._buffered):
+            take, rest, n = [], [], 0
+            for owner, fr in self._buffer:
+                room = self.batch_size - n
+                if room <= 0:
+                    rest.append((owner, fr))
+                elif len(fr) <= room:
+                    take.append((owner, fr))
+                    n += len(fr)
+                else:
+                    take.append((owner, fr[:room]))
+                    rest.append((owner, fr[room:]))
+                    n += room
+            self._buffer, self._buffered = rest, self._buffered - n
+            t = time.perf_counter()
+            emb = self.extractor.embed_arrays(np.concatenate([fr for _, fr in take]), batch_size=self.batch_size)
+            self._model_time += time.perf_counter() - t
+            self._frames += n
+            off = 0
+            for owner, fr in take:
+                self._parts[owner].append(emb[off:off + len(fr)])
+                off += len(fr)
+                self._waiting[owner] -= len(fr)
+                if self._waiting[owner] == 0:
+                    item_id, times, shots = self._meta.pop(owner)
+                    self._rows.append(self._rows_for(item_id, np.concatenate(self._parts.pop(owner)), times, shots))
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Embed what is still queued and return one row per added video."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        elapsed = time.perf_counter() - self._t0 if self._t0 is not None else 0.0
+        self.stats = {
+            'videos': float(self._videos),
+            'frames': float(self._frames),
+            'seconds': elapsed,
+            'frames_per_sec': self._frames / elapsed if elapsed > 0 else 0.0,
+            'model_frames_per_sec': self._frames / self._model_time if self._model_time > 0 else 0.0,
+        }
+        rows, self._rows = self._rows, []
+        return rows
+
+
+def merge_embeddings(results: List[Dict[str, Any]], rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    by_id = {r['id']: r for r in rows}
+    for res in results:
+        extra: Optional[Dict[str, Any]] = by_id.get(res['id'])
+        if extra:
+            res.update({k: v for k, v in extra.items() if k != 'id'})
+    return results
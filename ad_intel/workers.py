@@ -0,0 +1,317 @@
+from __future__ import annotations
+import concurrent.futures as futures
+import itertools
+import multiprocessing as mp
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .utils import rss_bytes
+
+
+# A supervised process pool. Unlike ProcessPoolExecutor each worker has its
+# own pipe and runs one task at a time, so the supervisor always knows which
+# task a worker holds: a hung or bloated worker can be killed and replaced
+# without breaking the pool or losing results from the other workers.
+
+@dataclass
+class TaskFailure:
+    reason: str  # 'timeout' | 'oom' | 'worker_died' | exception text
+
+
+@dataclass
+class PoolLimits:
+    item_timeout: Optional[float] = None          # wall-clock seconds per task
+    item_max_rss: Optional[int] = None            # bytes; worker killed if exceeded mid-task
+    max_tasks_per_worker: Optional[int] = None    # recycle after N tasks
+    worker_max_rss: Optional[int] = None          # bytes; recycle after a task leaves RSS above this
+    poll_interval: float = 0.5
+
+
+def _worker_main(conn, fn: Callable, max_tasks: Optional[int], max_rss: Optional[int], initializer: Optional[Callable[[], None]]) -> None:
+    if initializer is not None:
+        # Warm imports/models once per worker instead of once per task
+        initializer()
+    done = 0
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if msg is None:
+            return
+        idx, args = msg
+        try:
+            result = fn(*args)
+        except MemoryError:
+            result = TaskFailure('oom')
+        except Exception as e:
+            result = TaskFailure(str(e))
+        done += 1
+        rss = rss_bytes()
+        retire = bool((max_tasks and done >= max_tasks) or (max_rss and rss is not None and rss > max_rss))
+        conn.send((idx, result, retire))
+        if retire:
+            return
+
+
+class _Worker:
+    def __init__(self, ctx, fn: Callable, limits: PoolLimits, initializer: Optional[Callable[[], None]] = None):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(
+            target=_worker_main,
+            args=(child, fn, limits.max_tasks_per_worker, limits.worker_max_rss, initializer),
+            daemon=True,
+        )
+        self.proc.start()
+        child.close()
+        self.task: Optional[Tuple[int, float]] = None  # (index, start time)
+
+    def assign(self, idx: int, args: Tuple[Any, ...]) -> None:
+        self.conn.send((idx, args))
+        self.task = (idx, time.monotonic())
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+        self.conn.close()
+
+
+class SupervisedPool:
+    def __init__(
+        self,
+        fn: Callable,
+        workers: int,
+        limits: Optional[PoolLimits] = None,
+        mp_context: Optional[str] = None,
+        initializer: Optional[Callable[[], None]] = None,
+        class_limits: Optional[Dict[str, int]] = None,
+        controller: Optional[Any] = None,
+    ):
+        self.fn = fn
+        # size and class_limits may be changed between steps (see resources.AdaptiveController)
+        self.size = max(int(workers), 1)
+        self.class_limits: Dict[str, int] = dict(class_limits or {})
+        self.controller = controller
+        self.limits = limits or PoolLimits()
+        self.ctx = mp.get_context(mp_context)
+        self.initializer = initializer
+        self.recycled = 0
+        self.replaced = 0
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.ctx, self.fn, self.limits, self.initializer)
+
+    def _step(self, workers: List[_Worker], extra: Optional[list] = None) -> Tuple[List[Tuple[int, Any]], list]:
+        """
+        Wait for worker traffic once and reap: collect results, replace dead
+        workers, kill the ones over their time/memory budget. Returns the
+        finished (index, result) pairs and whichever `extra` waitables fired.
+        """
+        lim = self.limits
+        waitables = [w.conn for w in workers] + [w.proc.sentinel for w in workers] + list(extra or [])
+        ready = wait(waitables, timeout=lim.poll_interval)
+        finished: List[Tuple[int, Any]] = []
+        for w in list(workers):
+            if w.conn in ready or w.proc.sentinel in ready:
+                try:
+                    idx, result, retire = w.conn.recv()
+                except (EOFError, OSError):
+                    # Died without reporting (segfault, OOM killer, os._exit)
+                    if w.task is not None:
+                        finished.append((w.task[0], TaskFailure('worker_died')))
+                    workers.remove(w)
+                    w.kill()
+                    self.replaced += 1
+                    continue
+                finished.append((idx, result))
+                w.task = None
+                if retire:
+                    workers.remove(w)
+                    w.proc.join()
+                    w.conn.close()
+                    self.recycled += 1
+        now = time.monotonic()
+        for w in list(workers):
+            if w.task is None:
+                continue
+            reason = None
+            if lim.item_timeout and now - w.task[1] > lim.item_timeout:
+                reason = 'timeout'
+            elif lim.item_max_rss:
+                rss = rss_bytes(w.proc.pid)
+                if rss is not None and rss > lim.item_max_rss:
+                    reason = 'oom'
+            if reason:
+                finished.append((w.task[0], TaskFailure(reason)))
+                workers.remove(w)
+                w.kill()
+                self.replaced += 1
+        return finished, [x for x in (extra or []) if x in ready]
+
+    @staticmethod
+    def _close(workers: List[_Worker]) -> None:
+        for w in workers:
+            if w.task is None:
+                w.stop()
+            else:
+                w.kill()
+
+    def imap_unordered(self, arg_list: List[Tuple[Any, ...]], classes: Optional[List[str]] = None) -> Iterator[Tuple[int, Any]]:
+        """
+        Yield (index, result) as tasks finish; result is a TaskFailure when the worker had to be killed.
+
+        With `classes` (one label per task), at most class_limits[label]
+        tasks of a label run at once; the pool itself never exceeds `size`
+        workers, and idle workers above `size` are stopped.
+        """
+        labels = classes or [''] * len(arg_list)
+        pending: Dict[str, Deque[int]] = {}
+        for i, c in enumerate(labels):
+            pending.setdefault(c, deque()).append(i)
+        remaining = len(arg_list)
+        workers: List[_Worker] = []
+
+        def fill() -> None:
+            running: Dict[str, int] = {c: 0 for c in pending}
+            for w in workers:
+                if w.task is not None:
+                    running[labels[w.task[0]]] += 1
+            busy = sum(running.values())
+            startable = sum(min(len(q), max(self.class_limits.get(c, self.size) - running[c], 0)) for c, q in pending.items())
+            target = min(self.size, busy + startable)
+            for w in [w for w in workers if w.task is None][:max(len(workers) - target, 0)]:
+                workers.remove(w)
+                w.stop()
+            while len(workers) < target:
+                workers.append(self._spawn())
+            for w in workers:
+                if w.task is not None:
+                    continue
+                # Least-represented label first so image and video work interleave
+                for c in sorted(pending, key=lambda c: running[c]):
+                    if pending[c] and running[c] < self.class_limits.get(c, self.size):
+                        i = pending[c].popleft()
+                        w.assign(i, arg_list[i])
+                        running[c] += 1
+                        break
+
+        try:
+            fill()
+            while remaining:
+                finished, _ = self._step(workers)
+                remaining -= len(finished)
+                if self.controller is not None:
+                    self.controller.update(self, len(finished), sum(len(q) for q in pending.values()))
+                fill()
+                yield from finished
+        finally:
+            self._close(workers)
+
+    def map(self, arg_list: List[Tuple[Any, ...]]) -> Dict[int, Any]:
+        return dict(self.imap_unordered(arg_list))
+
+
+class PersistentPool(SupervisedPool):
+    """
+    Long-lived variant for the extraction service: workers stay up (and warm)
+    between requests, and submit() can be called from any thread. A
+    supervisor thread runs the same reaping loop as imap_unordered. If that
+    loop raises, `error` is set, every outstanding and later future resolves
+    to TaskFailure('pool_failed: ...') and the service reports unhealthy.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._queue: Deque[Tuple[int, Tuple[Any, ...]]] = deque()
+        self._futures: Dict[int, futures.Future] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._wake_r, self._wake_w = self.ctx.Pipe(duplex=False)
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self.workers: List[_Worker] = []
+        self.error: Optional[str] = None
+
+    def start(self) -> 'PersistentPool':
+        while len(self.workers) < self.size:
+            self.workers.append(self._spawn())
+        self._thread = threading.Thread(target=self._run, name='pool-supervisor', daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, *args: Any) -> futures.Future:
+        fut: futures.Future = futures.Future()
+        with self._lock:
+            if self.error is not None:
+                fut.set_result(TaskFailure(f"pool_failed: {self.error}"))
+                return fut
+            tid = next(self._ids)
+            self._futures[tid] = fut
+            self._queue.append((tid, args))
+        self._wake_w.send(None)
+        return fut
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._futures)
+
+    def _run(self) -> None:
+        try:
+            self._supervise()
+        except Exception as e:
+            # Without this the thread dies silently and every future waits forever
+            with self._lock:
+                self.error = repr(e)
+                failed = list(self._futures.values())
+                self._futures.clear()
+                self._queue.clear()
+            for fut in failed:
+                fut.set_result(TaskFailure(f"pool_failed: {self.error}"))
+            print(f"Worker pool supervisor failed: {self.error}")
+
+    def _supervise(self) -> None:
+        while not self._stopping:
+            while len(self.workers) < self.size:
+                self.workers.append(self._spawn())
+            with self._lock:
+                for w in self.workers:
+                    if w.task is None and self._queue:
+                        tid, args = self._queue.popleft()
+                        w.assign(tid, args)
+            finished, woke = self._step(self.workers, [self._wake_r])
+            if woke:
+                while self._wake_r.poll():
+                    self._wake_r.recv()
+            for tid, result in finished:
+                with self._lock:
+                    fut = self._futures.pop(tid, None)
+                if fut is not None:
+                    fut.set_result(result)
+
+    def shutdown(self) -> None:
+        self._stopping = True
+        self._wake_w.send(None)
+        if self._thread is not None:
+            self._thread.join()
+        self._close(self.workers)
+        self.workers = []
+        with self._lock:
+            for fut in self._futures.values():
+                fut.set_result(TaskFailure('shutdown'))
+            self._futures.clear()
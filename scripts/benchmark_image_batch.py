@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from ad_intel.extractors.image_basic import edge_density
+from ad_intel.extractors.image_batch import _bucket_features, _bucket_key, _load_rgb
+from ad_intel.pipeline import process_paths_parallel
+from ad_intel.utils import (
+    brightness_proxy,
+    colorfulness_hasler,
+    safe_mean_color,
+    safe_std_color,
+    saturation_proxy,
+)
+
+# Common display-ad sizes, all <= 512 px per side
+AD_SIZES = [(300, 250), (250, 250), (320, 50), (160, 512), (336, 280), (200, 200), (468, 60), (512, 512)]
+
+
+def make_thumbnails(src: Path, out_dir: Path, count: int) -> list:
+    sources = sorted(p for p in src.iterdir() if p.suffix.lower() in {'.png', '.jpg', '.jpeg'})
+    paths = []
+    for i in range(count):
+        w, h = AD_SIZES[i % len(AD_SIZES)]
+        with Image.open(sources[i % len(sources)]) as im:
+            thumb = im.convert('RGB').resize((w, h))
+        p = out_dir / f"t{i:05d}.{'jpg' if i % 2 else 'png'}"
+        thumb.save(p)
+        paths.append(p)
+    return paths
+
+
+def _per_image_stats(arr: np.ndarray):
+    return (safe_mean_color(arr), safe_std_color(arr), brightness_proxy(arr),
+            saturation_proxy(arr), colorfulness_hasler(arr), edge_density(arr))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched vs per-item feature extraction on small creatives")
+    parser.add_argument('--images', type=Path, default=Path('inputs/images'), help='Source images to resize into thumbnails')
+    parser.add_argument('--count', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--batch', type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_thumbnails(args.images, Path(tmp), args.count)
+        items = [{'id': p.stem, 'path': str(p), 'media_type': 'image'} for p in paths]
+
+        # Statistics only (colour moments, brightness, colourfulness, edges) on decoded arrays
+        arrs = [_load_rgb(p) for p in paths]
+        t0 = time.perf_counter()
+        for a in arrs:
+            _per_image_stats(a)
+        t_single = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        buckets: dict = {}
+        for a in arrs:
+            buckets.setdefault(_bucket_key(*a.shape[:2]), []).append(a)
+        for group in buckets.values():
+            _bucket_features(group)
+        t_batch = time.perf_counter() - t0
+        print(f"stats only: per-image {len(arrs) / t_single:.0f} img/s  batched {len(arrs) / t_batch:.0f} img/s  "
+              f"speedup={t_single / t_batch:.1f}x")
+
+        # End to end through the worker pool (decode, all features incl. palette, IPC)
+        timings = {}
+        outputs = {}
+        for label, batch in (('per-item', 0), ('batched', args.batch)):
+            t0 = time.perf_counter()
+            res = process_paths_parallel(items, args.workers, 0.5, 120, image_batch=batch, image_palette=True)
+            timings[label] = time.perf_counter() - t0
+            outputs[label] = {r['id']: r for r in res}
+        worst = 0.0
+        for pid, a in outputs['per-item'].items():
+            b = outputs['batched'][pid]
+            for k, v in a.items():
+                if isinstance(v, float) and not math.isnan(v):
+                    worst = max(worst, abs(v - b[k]) / max(abs(v), 1e-9))
+        print(f"end to end ({args.workers} workers): per-item {len(items) / timings['per-item']:.0f} img/s  "
+              f"batched {len(items) / timings['batched']:.0f} img/s  speedup={timings['per-item'] / timings['batched']:.1f}x  "
+              f"max rel diff={worst:.1e}")
+
+
+if __name__ == '__main__':
+    main()
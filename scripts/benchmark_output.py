@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from ad_intel.schema import to_arrow_table, write_parquet
+
+
+def _median_read(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy CSV output with the typed Parquet schema")
+    parser.add_argument('--csv', type=Path, default=Path('outputs/features_with_gemini_video.csv'), help='Existing features CSV for the corpus')
+    parser.add_argument('--replicate', type=int, default=1, help='Repeat rows N times (ids suffixed) to emulate a larger corpus')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    import pyarrow.parquet as pq
+
+    base = pd.read_csv(args.csv)
+    frames = []
+    for k in range(args.replicate):
+        f = base.copy()
+        if k:
+            f['id'] = f['id'].astype(str) + f"_{k}"
+        frames.append(f)
+    df = pd.concat(frames, ignore_index=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / 'features.csv'
+        pq_path = Path(tmp) / 'features.parquet'
+        # Legacy path: pandas DataFrame of dicts straight to CSV
+        df.to_csv(csv_path, index=False)
+        table = to_arrow_table(df.to_dict('records'))
+        write_parquet(table, pq_path)
+
+        csv_size = csv_path.stat().st_size
+        pq_size = pq_path.stat().st_size
+        csv_read = _median_read(lambda: pd.read_csv(csv_path), args.repeats)
+        pq_read = _median_read(lambda: pq.read_table(pq_path), args.repeats)
+
+    print(f"rows: {len(df)}  columns: csv={df.shape[1]} parquet={table.num_columns}")
+    print(f"size  csv={csv_size / 1024:.1f} KiB  parquet(zstd)={pq_size / 1024:.1f} KiB  ratio={csv_size / max(pq_size, 1):.1f}x")
+    print(f"read  csv={csv_read * 1000:.1f} ms  parquet={pq_read * 1000:.1f} ms  speedup={csv_read / max(pq_read, 1e-9):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import cv2
+from PIL import Image
+
+from ad_intel.extractors.palette import (
+    PALETTE_K,
+    PALETTE_SEED,
+    _kmeans_pp,
+    _sq_dists,
+    image_palette,
+    rgb_to_lab,
+)
+
+
+def full_kmeans_palette(img_rgb: np.ndarray, k: int = PALETTE_K, iters: int = 50, tol: float = 1e-3):
+    # Reference: Lloyd's k-means over every pixel of the image
+    x = rgb_to_lab(img_rgb.reshape(-1, 3)).astype(np.float64)
+    rng = np.random.default_rng(PALETTE_SEED)
+    centers = _kmeans_pp(x[rng.integers(0, len(x), size=min(len(x), 20000))], k, rng)
+    for _ in range(iters):
+        labels = _sq_dists(x, centers).argmin(1)
+        new = np.array([x[labels == j].mean(0) if np.any(labels == j) else centers[j] for j in range(k)])
+        shift = np.abs(new - centers).max()
+        centers = new
+        if shift < tol:
+            break
+    labels = _sq_dists(x, centers).argmin(1)
+    shares = np.bincount(labels, minlength=k) / float(len(labels))
+    return centers, shares
+
+
+def _as_arrays(feats: dict, k: int):
+    c = np.array([[feats[f'palette_{i}_l'], feats[f'palette_{i}_a'], feats[f'palette_{i}_b']] for i in range(k)])
+    s = np.array([feats[f'palette_{i}_share'] for i in range(k)])
+    return c, s
+
+
+def _agreement(c1, s1, c2, s2):
+    # Share-weighted mean Lab distance (delta E 76) from each fast centre to its nearest reference centre
+    d = np.sqrt(_sq_dists(c1, c2))
+    nearest = d.argmin(1)
+    de = float((d[np.arange(len(c1)), nearest] * s1).sum())
+    share_err = float(np.abs(np.bincount(nearest, weights=s1, minlength=len(c2)) - s2).sum() / 2)
+    return de, share_err
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark subsampled mini-batch palette vs full-image k-means")
+    parser.add_argument('--images', type=Path, default=Path('inputs/images'))
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 4], help='Upscale factors to emulate larger creatives')
+    parser.add_argument('--limit', type=int, default=6)
+    args = parser.parse_args()
+
+    paths = sorted(p for p in args.images.iterdir() if p.suffix.lower() in {'.png', '.jpg', '.jpeg'})[:args.limit]
+    for scale in args.scale:
+        t_fast, t_full, des, serrs, mpx = [], [], [], [], []
+        for p in paths:
+            with Image.open(p) as im:
+                arr = np.array(im.convert('RGB'))
+            if scale > 1:
+                arr = cv2.resize(arr, (arr.shape[1] * scale, arr.shape[0] * scale), interpolation=cv2.INTER_NEAREST)
+            mpx.append(arr.shape[0] * arr.shape[1] / 1e6)
+            t0 = time.perf_counter()
+            fast = image_palette(arr)
+            t_fast.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            c_ref, s_ref = full_kmeans_palette(arr)
+            t_full.append(time.perf_counter() - t0)
+            de, serr = _agreement(*_as_arrays(fast, PALETTE_K), c_ref, s_ref)
+            des.append(de)
+            serrs.append(serr)
+        print(f"scale x{scale}: {np.mean(mpx):.2f} MPx/image  "
+              f"subsampled={np.mean(t_fast) * 1000:.1f} ms  full={np.mean(t_full) * 1000:.1f} ms  "
+              f"speedup={np.mean(t_full) / np.mean(t_fast):.1f}x  "
+              f"mean dE={np.mean(des):.2f}  share diff={np.mean(serrs):.3f}")
+
+
+if __name__ == '__main__':
+    main()
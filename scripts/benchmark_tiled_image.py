@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import math
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Runs in a fresh interpreter. The import-time peak is cleared (Linux
+# clear_refs) so VmHWM is the peak of this one extraction.
+CHILD = r'''
+import json, sys, time
+from PIL import Image
+from ad_intel.extractors.image_basic import extract_image_features
+def status(key):
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(key))
+with open('/proc/self/clear_refs', 'w') as f:
+    f.write('5')
+base = status('VmRSS:')
+t0 = time.perf_counter()
+if sys.argv[2] == 'decode':
+    Image.open(sys.argv[1]).load()
+    feats = {}
+else:
+    feats = extract_image_features(sys.argv[1], tiled_min_pixels=int(sys.argv[2]), palette=True)
+t = time.perf_counter() - t0
+print(json.dumps({'feats': feats, 'sec': t, 'peak_kb': status('VmHWM:') - base}))
+'''
+
+
+def make_image(src: Path, out: Path, megapixels: float) -> Path:
+    with Image.open(src) as im:
+        a = np.array(im.convert('RGB'))
+    scale = math.sqrt(megapixels * 1e6 / (a.shape[0] * a.shape[1]))
+    big = cv2.resize(a, (int(a.shape[1] * scale), int(a.shape[0] * scale)), interpolation=cv2.INTER_CUBIC)
+    Image.fromarray(big).save(out)
+    return out
+
+
+def run(path: Path, mode: str) -> dict:
+    arg = {'decode': 'decode', 'tiled': '1', 'whole': str(1 << 62)}[mode]
+    res = subprocess.run([sys.executable, '-c', CHILD, str(path), arg], capture_output=True, text=True, check=True)
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory and time of whole-image vs row-band (tiled) image features")
+    parser.add_argument('--image', type=Path, default=None, help='Source image to upscale (default: first in inputs/images)')
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[8, 24, 48])
+    args = parser.parse_args()
+    src = args.image or sorted(p for p in Path('inputs/images').iterdir() if p.suffix.lower() in {'.png', '.jpg', '.jpeg'})[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mp in args.megapixels:
+            path = make_image(src, Path(tmp) / f"big_{mp:g}mp.png", mp)
+            decode, whole, tiled = run(path, 'decode'), run(path, 'whole'), run(path, 'tiled')
+            a, b = whole['feats'], tiled['feats']
+            worst = max(abs(a[k] - b[k]) / max(abs(a[k]), 1e-9) for k in a if isinstance(a[k], float))
+            print(f"{mp:g} MP: decode only +{decode['peak_kb'] / 1024:.0f} MB  "
+                  f"whole-image peak +{whole['peak_kb'] / 1024:.0f} MB {whole['sec']:.2f}s  "
+                  f"tiled peak +{tiled['peak_kb'] / 1024:.0f} MB {tiled['sec']:.2f}s  "
+                  f"edge_density equal={a['edge_density'] == b['edge_density']}  max rel diff={worst:.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,112 +1,279 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
 import os
 import sys
-import zipfile
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
 from tqdm import tqdm
 
-from ad_intel.pipeline import process_paths_parallel, detect_media_type
-
-
-def extract_zip(zip_path: Path, dest_dir: Path) -> Path:
-    dest_dir.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(zip_path, 'r') as zf:
-        zf.extractall(dest_dir)
-    return dest_dir
-
-
-def find_image_paths() -> list[Path]:
-    """Find all image files in the images directory."""
-    images_dir = Path("/Users/navitraa/ad-intelligence/inputs/images")
-    image_exts = {'.png', '.jpg', '.jpeg'}
-    
-    paths = []
-    if images_dir.exists():
-        for root, _, files in os.walk(images_dir):
-            for f in files:
-                p = Path(root) / f
-                if p.suffix.lower() in image_exts:
-                    paths.append(p)
-    return sorted(paths)
-
-
-def find_video_paths() -> list[Path]:
-    """Find all video files in the videos directory."""
-    videos_dir = Path("/Users/navitraa/ad-intelligence/inputs/videos")
-    video_exts = {'.mp4', '.avi', '.mov', '.mkv'}
-    
-    paths = []
-    if videos_dir.exists():
-        for root, _, files in os.walk(videos_dir):
-            for f in files:
-                p = Path(root) / f
-                if p.suffix.lower() in video_exts:
-                    paths.append(p)
-    return sorted(paths)
+from ad_intel.annotation import (
+    DEFAULT_BASE_URL,
+    DEFAULT_MODEL,
+    AnnotatorConfig,
+    GeminiRestClient,
+    annotate_videos,
+    merge_annotations,
+)
+from ad_intel.manifest import extract_zip, load_manifest, manifest_items, save_manifest, scan
+from ad_intel.pipeline import process_paths_parallel
+from ad_intel.resources import available_cpus, plan_resources
+from ad_intel.schema import backbone_embedding_dims, to_arrow_table, write_csv, write_parquet
+from ad_intel.sharding import MergeError, merge_parts, shard_items, write_part
+from ad_intel.workers import PoolLimits
+
+
+def build_items(input_path: Path, manifest_path: Path, threads: int) -> list[dict]:
+    """Scan --input (a directory, or a zip extracted next to the manifest) into work items."""
+    if input_path.is_file() and input_path.suffix.lower() == '.zip':
+        dest = manifest_path.parent / f"{input_path.stem}_extracted"
+        # Extracted again only when the zip's size or mtime changes (see manifest.extract_zip)
+        input_path = extract_zip(input_path, dest)
+    previous = load_manifest(manifest_path)
+    manifest = scan(input_path, previous=previous, threads=threads)
+    save_manifest(manifest, manifest_path)
+    st = manifest['stats']
+    print(f"Scanned {input_path}: {st['dirs_scanned']} directories read, {st['dirs_reused']} unchanged (manifest: {manifest_path})")
+    return manifest_items(manifest)
+
+
+def default_manifest_path(input_path: Path) -> Path:
+    digest = hashlib.sha1(str(input_path.resolve()).encode('utf-8')).hexdigest()[:12]
+    return Path('.cache') / f"manifest-{digest}.json"
+
+
+def _mb(v):
+    return int(v * 1024 * 1024) if v else None
+
+
+def merge_main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog='process_ads.py merge', description="Merge sharded output parts into one Parquet file")
+    parser.add_argument('--parts', required=True, type=Path, help='Directory holding part-*.parquet and their manifests')
+    parser.add_argument('--output', required=True, type=Path, help='Merged .parquet output path')
+    args = parser.parse_args(argv)
+
+    try:
+        report = merge_parts(args.parts, args.output)
+    except MergeError as e:
+        print(str(e))
+        sys.exit(1)
+    print(f"Merged {report['parts']} parts ({report['rows']} rows). Output: {args.output}")
+
+
+def serve_main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog='process_ads.py serve', description="Run a long-lived extraction service with warm workers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--socket', type=Path, default=None, help='Listen on this unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=available_cpus())
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='OpenCV/BLAS/torch/decoder threads per worker')
+    parser.add_argument('--frame-interval', type=float, default=0.5)
+    parser.add_argument('--max-frames', type=int, default=120)
+    parser.add_argument('--image-palette', action='store_true', help='Add the dominant-colour palette to image rows (~25 ms per image)')
+    parser.add_argument('--item-timeout', type=float, default=None)
+    parser.add_argument('--item-max-rss-mb', type=float, default=None)
+    parser.add_argument('--max-tasks-per-worker', type=int, default=None)
+    parser.add_argument('--worker-max-rss-mb', type=float, default=None)
+    parser.add_argument('--embed-model', choices=['resnet50', 'clip'], default=None, help='Keep this backbone loaded for requests with "embed": true')
+    parser.add_argument('--embed-batch-size', type=int, default=64)
+    parser.add_argument('--embed-max-wait-ms', type=float, default=10.0, help='How long the micro-batcher waits to fill a batch')
+    args = parser.parse_args(argv)
+
+    from ad_intel.service import ExtractionService, serve
+
+    service = ExtractionService(
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        frame_interval=args.frame_interval,
+        max_frames=args.max_frames,
+        limits=PoolLimits(
+            item_timeout=args.item_timeout,
+            item_max_rss=_mb(args.item_max_rss_mb),
+            max_tasks_per_worker=args.max_tasks_per_worker,
+            worker_max_rss=_mb(args.worker_max_rss_mb),
+        ),
+        embed_model=args.embed_model,
+        embed_batch_size=args.embed_batch_size,
+        embed_max_wait=args.embed_max_wait_ms / 1000.0,
+        image_palette=args.image_palette,
+    )
+    serve(service, host=args.host, port=args.port, socket_path=args.socket)
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        merge_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description="Ad Intelligence Feature Extraction")
     parser.add_argument('--input', required=True, type=Path, help='Path to ads.zip or directory')
     parser.add_argument('--output', required=True, type=Path, help='Output file path (.csv or .parquet)')
     parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
-    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--workers', type=int, default=None, help='Initial worker processes (default: available CPUs / --threads-per-worker)')
+    parser.add_argument('--image-workers', type=int, default=None, help='Max concurrent image items (default: workers, capped by free memory)')
+    parser.add_argument('--video-workers', type=int, default=None, help='Max concurrent video items/segments (default: workers, capped by free memory)')
+    parser.add_argument('--threads-per-worker', type=int, default=None, help='OpenCV/BLAS/torch/decoder threads per worker')
+    parser.add_argument('--no-adaptive', action='store_true', help='Keep the worker count fixed instead of tuning it from throughput, CPU and memory')
+    parser.add_argument('--manifest', type=Path, default=None, help='Scan manifest to reuse between runs (default: .cache/manifest-<hash of input>.json)')
+    parser.add_argument('--scan-threads', type=int, default=16, help='Threads for the parallel directory scan')
     parser.add_argument('--frame-interval', type=float, default=0.5, help='Seconds between sampled frames for video features')
     parser.add_argument('--max-frames', type=int, default=120, help='Max frames to sample per video')
+    parser.add_argument('--image-palette', action='store_true', help='Add the dominant-colour palette to image rows (~25 ms of k-means per image); videos always get one')
+    parser.add_argument('--image-batch', type=int, default=0, help='Send images to workers in groups of N and compute small (<=512px) ones together')
+    parser.add_argument('--video-decoders', type=int, default=0, help='Run videos through a two-stage pipeline with this many decoder processes (shared-memory frame ring)')
+    parser.add_argument('--video-analysers', type=int, default=1, help='Frame-analysis processes for --video-decoders')
+    parser.add_argument('--video-ring-mb', type=float, default=None, help='Shared-memory budget of the frame ring (default: 256, or half the free space of /dev/shm if smaller)')
+    parser.add_argument('--split-video-sec', type=float, default=None, help='Split videos longer than this into segments of about this length, processed on separate workers')
+    parser.add_argument('--item-timeout', type=float, default=None, help='Wall-clock seconds per item before it is recorded as error=timeout')
+    parser.add_argument('--item-max-rss-mb', type=float, default=None, help='Worker RSS while processing one item before it is recorded as error=oom')
+    parser.add_argument('--max-tasks-per-worker', type=int, default=None, help='Replace each worker after this many items')
+    parser.add_argument('--worker-max-rss-mb', type=float, default=None, help='Replace a worker once its RSS is above this after an item')
+    parser.add_argument('--shard-index', type=int, default=None, help='Process only this shard of the manifest (0-based)')
+    parser.add_argument('--shard-count', type=int, default=None, help='Total number of shards; --output becomes the parts directory')
+    parser.add_argument('--shard-balance', choices=['size', 'hash'], default='size', help='Balance shards by probed file size or by id hash only')
+    parser.add_argument('--video-embeddings', action='store_true', help='Add pooled deep embeddings of sampled video frames (needs torch)')
+    parser.add_argument('--embed-model', choices=['resnet50', 'clip'], default='resnet50')
+    parser.add_argument('--embed-batch-size', type=int, default=64, help='Frames per backbone batch, shared across videos')
+    parser.add_argument('--embed-per-shot', action='store_true', help='Also store one mean embedding per detected shot')
+    parser.add_argument('--annotate', action='store_true', help='Add LLM video annotations (needs GEMINI_API_KEY)')
+    parser.add_argument('--llm-model', default=DEFAULT_MODEL)
+    parser.add_argument('--llm-base-url', default=os.environ.get('GEMINI_BASE_URL', DEFAULT_BASE_URL), help='API base URL; point at ad_intel.annotation_stub for offline runs')
+    parser.add_argument('--llm-cache-dir', type=Path, default=Path('.cache/llm'), help='Response cache keyed by video hash and a hash of prompt, schema and model')
+    parser.add_argument('--llm-concurrency', type=int, default=8)
+    parser.add_argument('--llm-rpm', type=float, default=60.0, help='Max generate requests per minute')
+    parser.add_argument('--llm-tpm', type=float, default=1_000_000.0, help='Max tokens per minute')
     args = parser.parse_args()
 
-    # Get image and video paths from separate directories
-    image_paths = find_image_paths()
-    video_paths = find_video_paths()
-    
-    if not image_paths and not video_paths:
-        print("No media found in images or videos directories.")
+    if args.video_decoders and args.split_video_sec:
+        parser.error('--video-decoders and --split-video-sec cannot be combined')
+    sharded = args.shard_count is not None
+    if sharded != (args.shard_index is not None):
+        parser.error('--shard-index and --shard-count must be given together')
+
+    manifest_path = args.manifest or default_manifest_path(args.input)
+    items = build_items(args.input, manifest_path, args.scan_threads)
+
+    if not items:
+        print(f"No media found under {args.input}.")
         sys.exit(1)
 
-    items = []
-    
-    # Add image files
-    for p in image_paths:
-        items.append({
-            'id': p.stem,
-            'path': str(p),
-            'media_type': 'image'
-        })
-    
-    # Add video files
-    for p in video_paths:
-        items.append({
-            'id': p.stem,
-            'path': str(p),
-            'media_type': 'video'
-        })
+    all_ids = [it['id'] for it in items]
+    if sharded:
+        try:
+            items = shard_items(items, args.shard_index, args.shard_count, balance=args.shard_balance)
+        except ValueError as e:
+            parser.error(str(e))
+
+    resources = plan_resources(
+        workers=args.workers,
+        image_workers=args.image_workers,
+        video_workers=args.video_workers,
+        threads_per_worker=args.threads_per_worker,
+        adaptive=not args.no_adaptive,
+    )
+    print(resources.describe())
+
+    embedder = None
+    embedding_dims = None
+    if args.video_embeddings:
+        from ad_intel.video_embedding import VideoEmbedder
+
+        # Loaded before the pool starts; workers send back the frames they already decoded
+        embedder = VideoEmbedder(
+            model_name=args.embed_model,
+            batch_size=args.embed_batch_size,
+            per_shot=args.embed_per_shot,
+        )
+        embedding_dims = backbone_embedding_dims(embedder.dim)
 
     results = process_paths_parallel(
         items,
-        workers=args.workers,
+        workers=resources.workers,
+        resources=resources,
         frame_interval=args.frame_interval,
         max_frames=args.max_frames,
+        split_video_sec=args.split_video_sec,
+        image_batch=args.image_batch,
+        image_palette=args.image_palette,
+        video_pipeline=(args.video_decoders, args.video_analysers) if args.video_decoders else None,
+        video_ring_bytes=_mb(args.video_ring_mb),
+        limits=PoolLimits(
+            item_timeout=args.item_timeout,
+            item_max_rss=_mb(args.item_max_rss_mb),
+            max_tasks_per_worker=args.max_tasks_per_worker,
+            worker_max_rss=_mb(args.worker_max_rss_mb),
+        ),
+        embed_crop=embedder.crop if embedder else None,
+        on_result=partial(embedder.add, frame_interval=args.frame_interval) if embedder else None,
     )
 
-    df = pd.DataFrame(results)
+    if embedder:
+        from ad_intel.video_embedding import merge_embeddings
+
+        results = merge_embeddings(results, embedder.finish())
+        st = embedder.stats
+        print(f"Embedded {int(st['frames'])} frames from {int(st['videos'])} videos: "
+              f"{st['frames_per_sec']:.1f} frames/sec end-to-end, {st['model_frames_per_sec']:.1f} frames/sec in the model")
+
+    if args.annotate:
+        api_key = os.environ.get('GEMINI_API_KEY', '')
+        if not api_key:
+            print('GEMINI_API_KEY not set, skipping LLM annotation.')
+        else:
+            client = GeminiRestClient(api_key, model=args.llm_model, base_url=args.llm_base_url)
+            config = AnnotatorConfig(
+                concurrency=args.llm_concurrency,
+                requests_per_minute=args.llm_rpm,
+                tokens_per_minute=args.llm_tpm,
+            )
+            videos = [it for it in items if it['media_type'] == 'video']
+            annotations = annotate_videos(videos, client, cache_dir=args.llm_cache_dir, config=config)
+            results = merge_annotations(pd.DataFrame(results), annotations).to_dict('records')
+
+    if sharded:
+        manifest_path = write_part(
+            to_arrow_table(results, embedding_dims),
+            args.output,
+            args.shard_index,
+            args.shard_count,
+            assigned_ids=[it['id'] for it in items],
+            all_ids=all_ids,
+        )
+        print(f"Processed {len(results)} items for shard {args.shard_index}/{args.shard_count}. Manifest: {manifest_path}")
+        return
+
     args.output.parent.mkdir(parents=True, exist_ok=True)
 
+    table, table_error = None, None
+    try:
+        table = to_arrow_table(results, embedding_dims)
+    except ImportError as e:
+        table_error = f"Parquet dependencies missing: {e}"
+    except Exception as e:
+        # Extraction is done at this point; never lose it to a serialisation problem
+        table_error = f"Could not build the typed table: {e}"
+
     if args.format == 'csv' or args.output.suffix.lower() == '.csv':
-        df.to_csv(args.output, index=False)
+        if table is not None:
+            write_csv(table, args.output)
+        else:
+            print(f"{table_error}; writing untyped CSV")
+            pd.DataFrame(results).to_csv(args.output, index=False)
     else:
-        try:
-            import pyarrow  # noqa: F401
-            df.to_parquet(args.output, index=False)
-        except Exception as e:
-            print(f"Parquet dependencies missing, writing CSV instead: {e}")
+        if table is not None:
+            write_parquet(table, args.output)
+        else:
+            print(f"{table_error}; writing CSV instead")
             csv_fallback = args.output.with_suffix('.csv')
-            df.to_csv(csv_fallback, index=False)
+            pd.DataFrame(results).to_csv(csv_fallback, index=False)
             print(f"Wrote CSV to {csv_fallback}")
 
-    print(f"Processed {len(df)} items. Output: {args.output}")
+    print(f"Processed {len(results)} items. Output: {args.output}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+REPO = Path(__file__).resolve().parents[1]
+
+
+def write_image(path: Path, w: int, h: int, seed: int) -> Path:
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+    cv2.rectangle(img, (w // 4, h // 4), (w // 2, h // 2), (255, 255, 255), -1)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(str(path), img)
+    return path
+
+
+CUT_COLOURS = [(0, 0, 200), (0, 200, 0), (200, 0, 0), (200, 200, 200)]
+
+
+def write_video(path: Path, frames: int = 24, fps: float = 12.0, size=(96, 64), cuts: int = 0) -> Path:
+    # With cuts, the background switches flat colour that many times (hard cuts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for i in range(frames):
+        colour = CUT_COLOURS[i * (cuts + 1) // frames % len(CUT_COLOURS)] if cuts else (0, 0, 0)
+        frame = np.full((size[1], size[0], 3), colour, dtype=np.uint8)
+        cv2.circle(frame, (4 * i % size[0], size[1] // 2), 8, (0, 255, 255), -1)
+        out.write(frame)
+    out.release()
+    return path
+
+
+@pytest.fixture
+def media_dir(tmp_path: Path) -> Path:
+    root = tmp_path / 'ads'
+    for i, (w, h) in enumerate([(64, 48), (120, 80), (33, 70), (200, 150), (50, 50)]):
+        write_image(root / ('a' if i % 2 else 'b') / f"i{i:04d}.{'png' if i % 3 else 'jpg'}", w, h, i)
+    write_video(root / 'v0001.mp4')
+    write_video(root / 'b' / 'v0002.mp4', frames=36)
+    return root
+
+
+def run_cli(*args: str, cwd: Path) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(REPO))
+    res = subprocess.run([sys.executable, str(REPO / 'scripts' / 'process_ads.py'), *args],
+                         cwd=cwd, env=env, capture_output=True, text=True)
+    assert res.returncode == 0, res.stdout + res.stderr
+    return res
@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pytest
+
+from ad_intel import annotation
+from ad_intel.annotation import AnnotatorConfig, GeminiRestClient, annotate_videos
+from ad_intel.annotation_stub import canned_answers, start_stub_server
+
+FAST = dict(backoff_base=0.01, poll_initial=0.01, poll_max=0.05, requests_per_minute=6000, file_requests_per_minute=6000)
+
+
+@pytest.fixture
+def videos(tmp_path: Path):
+    items = []
+    for i in range(3):
+        p = tmp_path / f"v{i}.mp4"
+        p.write_bytes(bytes([i]) * (100_000 + i))
+        items.append({'id': f"v{i}", 'path': str(p)})
+    return items
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, url, state = start_stub_server(port=0, **kwargs)
+        servers.append(server)
+        return GeminiRestClient('test-key', base_url=url), state
+
+    yield start
+    for s in servers:
+        s.shutdown()
+        s.server_close()
+
+
+def test_success(stub, videos, tmp_path):
+    client, state = stub(processing_polls=2)
+    rows = annotate_videos(videos, client, cache_dir=tmp_path / 'cache', config=AnnotatorConfig(**FAST))
+    assert [r['id'] for r in rows] == ['v0', 'v1', 'v2']
+    for r in rows:
+        assert 'llm_error' not in r
+        assert {k: r[k] for k in canned_answers()} == canned_answers()
+    assert state.counts['upload'] == 3 and state.counts['generate'] == 3 and state.counts['delete'] == 3
+    assert state.uploaded_bytes == sum(Path(v['path']).stat().st_size for v in videos)
+    assert not state.files
+
+
+def test_429_is_retried_and_limited_per_attempt(stub, videos, tmp_path, monkeypatch):
+    client, state = stub(fail_first=2)
+    acquired = []
+    orig = annotation.RateLimiter.acquire
+
+    async def counting(self, est_tokens):
+        acquired.append(est_tokens)
+        await orig(self, est_tokens)
+
+    monkeypatch.setattr(annotation.RateLimiter, 'acquire', counting)
+    rows = annotate_videos(videos[:1], client, cache_dir=None, config=AnnotatorConfig(**FAST))
+    assert 'llm_error' not in rows[0] and rows[0]['cuts'] == 3
+    assert state.counts['generate'] == 3
+    # Every generate attempt, including the two rejected ones, went through the limiter
+    assert acquired.count(AnnotatorConfig().est_tokens_per_video) == 3
+    # Upload and status polls went through the file-request limiter
+    assert acquired.count(0) >= 1 + state.counts['get'] + state.counts['delete']
+
+
+def test_second_run_hits_cache(stub, videos, tmp_path):
+    client, state = stub()
+    cfg = AnnotatorConfig(**FAST)
+    first = annotate_videos(videos, client, cache_dir=tmp_path / 'cache', config=cfg)
+    counts = dict(state.counts)
+    second = annotate_videos(videos, client, cache_dir=tmp_path / 'cache', config=cfg)
+    assert second == first
+    assert state.counts == counts
+
+
+def test_cache_key_follows_prompt_and_model(monkeypatch):
+    key = annotation.AnnotationCache.key('abc', 'm1')
+    assert annotation.AnnotationCache.key('abc', 'm2') != key
+    monkeypatch.setitem(annotation.QUESTIONS, 'cuts', ('integer', 'How many hard cuts?'))
+    assert annotation.AnnotationCache.key('abc', 'm1') != key
+
+
+def test_schema_invalid_output(stub, videos, tmp_path):
+    # Retried like a transient error when the model recovers
+    client, state = stub(invalid_first=1)
+    rows = annotate_videos(videos[:1], client, cache_dir=tmp_path / 'cache', config=AnnotatorConfig(**FAST))
+    assert 'llm_error' not in rows[0] and state.counts['generate'] == 2
+
+    # Reported as an error row, and not cached, when it never does
+    client, state = stub(invalid_first=100)
+    cfg = AnnotatorConfig(max_retries=2, **FAST)
+    rows = annotate_videos(videos[1:2], client, cache_dir=tmp_path / 'cache', config=cfg)
+    assert 'missing required keys' in rows[0]['llm_error']
+    assert state.counts['generate'] == 3 and state.counts['delete'] == 1
+    # Only v0's answers from the first half are cached
+    assert len(list((tmp_path / 'cache').glob('*.json'))) == 1
@@ -0,0 +1,58 @@
+import os
+import time
+
+import pytest
+
+from ad_intel import frame_ring
+from ad_intel.extractors.video_basic import extract_video_features
+from ad_intel.frame_ring import extract_videos_pipelined
+
+from .conftest import write_video
+
+FI, MF = 0.25, 120
+
+
+@pytest.fixture
+def videos(tmp_path):
+    items = []
+    for name in ('a', 'crash', 'b', 'hang', 'c'):
+        path = write_video(tmp_path / f"{name}.mp4", frames=24 + 6 * len(items))
+        items.append({'id': name, 'path': str(path), 'media_type': 'video'})
+    return items
+
+
+@pytest.fixture
+def faulty_decoder(monkeypatch):
+    # Forked decoders inherit the patched function
+    decode = frame_ring._decode_video
+
+    def faulty(ring, free, out, vid, path, *args):
+        if path.stem == 'crash':
+            os._exit(1)
+        if path.stem == 'hang':
+            time.sleep(60)
+        return decode(ring, free, out, vid, path, *args)
+
+    monkeypatch.setattr(frame_ring, '_decode_video', faulty)
+
+
+def _features(item):
+    return {'id': item['id'], 'media_type': 'video', **extract_video_features(item['path'], FI, MF)}
+
+
+def test_default_ring_matches_single_process(videos):
+    # Small frames used to mean thousands of slots and a queue that never drained at exit
+    good = [it for it in videos if it['id'] in ('a', 'b', 'c')]
+    rows = extract_videos_pipelined(good, FI, MF, decoders=2, analysers=2)
+    assert sorted(rows, key=lambda r: r['id']) == [_features(it) for it in good]
+
+
+def test_dead_and_stuck_workers_become_error_rows(videos, faulty_decoder):
+    t0 = time.monotonic()
+    rows = {r['id']: r for r in extract_videos_pipelined(videos, FI, MF, decoders=1, analysers=1, item_timeout=2.0)}
+    assert time.monotonic() - t0 < 30
+    assert rows['crash'] == {'id': 'crash', 'media_type': 'video', 'error': 'worker_died'}
+    assert rows['hang'] == {'id': 'hang', 'media_type': 'video', 'error': 'timeout'}
+    for it in videos:
+        if it['id'] in ('a', 'b', 'c'):
+            assert rows[it['id']] == _features(it)
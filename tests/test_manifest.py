@@ -0,0 +1,63 @@
+import os
+import struct
+import zipfile
+
+from ad_intel.manifest import extract_zip, manifest_items, scan, sniff_bytes
+
+from .conftest import write_image, write_video
+
+
+def _bmp_head(header_size: int) -> bytes:
+    return b'BM' + struct.pack('<IHHI', 1000, 0, 0, 54) + struct.pack('<I', header_size) + bytes(14)
+
+
+def test_sniff_formats():
+    assert sniff_bytes(_bmp_head(40)) == ('image', 'bmp')
+    assert sniff_bytes(_bmp_head(124)) == ('image', 'bmp')
+    # Text that happens to start with "BM"
+    assert sniff_bytes(b'BMW dealer list, 2024 edition\n') == ('unknown', '')
+    assert sniff_bytes(b'\x00\x00\x00\x18ftypheic' + bytes(12)) == ('unsupported', 'heic')
+    assert sniff_bytes(b'\x00\x00\x00\x1cftypavif' + bytes(12)) == ('unsupported', 'avif')
+    assert sniff_bytes(b'\x00\x00\x00\x18ftypisom' + bytes(12)) == ('video', 'mp4')
+
+
+def test_ids_stay_unique_when_stems_clash(tmp_path):
+    write_image(tmp_path / 'x' / 'ad1.png', 8, 8, 0)
+    write_video(tmp_path / 'x' / 'ad1.mp4')
+    write_image(tmp_path / 'y' / 'ad1.jpg', 8, 8, 1)
+    write_image(tmp_path / 'y' / 'ad2.png', 8, 8, 2)
+    (tmp_path / 'y' / 'photo.heic').write_bytes(b'\x00\x00\x00\x18ftypheic' + bytes(64))
+    (tmp_path / 'notes.txt').write_text('not media')
+
+    items = manifest_items(scan(tmp_path, threads=2))
+    ids = {it['id']: it['media_type'] for it in items}
+    assert ids == {'x/ad1.mp4': 'video', 'x/ad1.png': 'image', 'y/ad1': 'image', 'ad2': 'image', 'photo': 'unsupported'}
+
+
+def test_rescan_reuses_unchanged_directories(tmp_path):
+    write_image(tmp_path / 'a' / 'i1.png', 8, 8, 0)
+    write_image(tmp_path / 'b' / 'i2.png', 8, 8, 1)
+    first = scan(tmp_path, threads=2)
+    write_image(tmp_path / 'b' / 'i3.png', 8, 8, 2)
+    second = scan(tmp_path, previous=first, threads=2)
+    # Only b/ is listed again; the root and a/ are unchanged
+    assert second['stats'] == {'dirs_scanned': 1, 'dirs_reused': 2}
+    assert [it['id'] for it in manifest_items(second)] == ['i1', 'i2', 'i3']
+
+
+def test_zip_is_extracted_again_only_when_it_changes(tmp_path):
+    src = write_image(tmp_path / 'src' / 'i1.png', 8, 8, 0)
+    zpath = tmp_path / 'ads.zip'
+    with zipfile.ZipFile(zpath, 'w') as zf:
+        zf.write(src, 'i1.png')
+    dest = tmp_path / 'out'
+    extract_zip(zpath, dest)
+    mtime = os.stat(dest / 'i1.png').st_mtime_ns
+    extract_zip(zpath, dest)
+    assert os.stat(dest / 'i1.png').st_mtime_ns == mtime
+
+    with zipfile.ZipFile(zpath, 'w') as zf:
+        zf.write(src, 'i2.png')
+    os.utime(zpath, ns=(mtime + 10**9, mtime + 10**9))
+    extract_zip(zpath, dest)
+    assert sorted(p.name for p in dest.iterdir() if not p.name.startswith('.')) == ['i2.png']
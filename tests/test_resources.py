@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ad_intel import resources
+from ad_intel.resources import AdaptiveController, plan_resources
+
+GB = 2**30
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    """Controller on a fake clock, CPU sampler and memory reading; returns (controller, pool, step)."""
+    clock = _Clock()
+    monkeypatch.setattr(resources.time, 'monotonic', clock)
+    monkeypatch.setattr(resources, 'mem_available', lambda: 64 * GB)
+    plan = plan_resources(cpus=4)
+    ctl = AdaptiveController(plan, interval=5.0, log=lambda msg: None)
+    pool = SimpleNamespace(size=plan.workers, class_limits=plan.class_limits())
+
+    def step(rate: float, busy: float, backlog: int = 100) -> int:
+        ctl.cpu = SimpleNamespace(sample=lambda: busy)
+        clock.t += ctl.interval
+        ctl.update(pool, int(rate * ctl.interval), backlog)
+        return pool.size
+
+    return ctl, pool, step
+
+
+def test_plan_leaves_room_to_grow(monkeypatch):
+    monkeypatch.setattr(resources, 'mem_available', lambda: 64 * GB)
+    plan = plan_resources(cpus=64)
+    assert plan.workers == 64 and plan.max_workers == 96
+    assert plan_resources(cpus=64, adaptive=False).max_workers == 64
+
+
+def test_grows_into_idle_cpu_up_to_the_ceiling(drive):
+    ctl, pool, step = drive
+    assert pool.size == 4 and ctl.plan.max_workers == 6
+    assert step(rate=4.0, busy=0.5) == 5
+    assert step(rate=5.0, busy=0.6) == 6
+    assert step(rate=6.0, busy=0.6) == 6
+    assert [h['reason'] for h in ctl.history] == ['cpu headroom', 'cpu headroom']
+    assert pool.class_limits == {'image': 6, 'video': 6}
+
+
+def test_no_growth_without_a_backlog_or_when_busy(drive):
+    _, _, step = drive
+    assert step(rate=4.0, busy=0.5, backlog=2) == 4
+    assert step(rate=4.0, busy=0.95) == 4
+
+
+def test_reverts_a_scale_up_that_lowered_throughput(drive):
+    ctl, _, step = drive
+    assert step(rate=4.0, busy=0.5) == 5
+    assert step(rate=3.0, busy=0.5) == 4
+    assert ctl.history[-1]['reason'] == 'throughput fell after scale-up'
+    # Holds instead of growing straight back
+    assert [step(rate=3.0, busy=0.5) for _ in range(3)] == [4, 4, 4]
+    assert step(rate=3.0, busy=0.5) == 5
+
+
+def test_sheds_workers_above_one_per_core_when_saturated(drive):
+    ctl, _, step = drive
+    assert step(rate=4.0, busy=0.5) == 5
+    assert step(rate=5.0, busy=0.6) == 6
+    # Saturated and flat: back off, but never below one worker per core
+    assert step(rate=5.1, busy=0.99) == 5
+    assert ctl.history[-1]['reason'] == 'cpu saturated, throughput flat'
+    for _ in range(10):
+        step(rate=5.1, busy=0.99)
+    assert ctl.history[-1]['workers'] == 4
+    assert step(rate=5.1, busy=0.99) == 4
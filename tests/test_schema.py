@@ -0,0 +1,41 @@
+import math
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ad_intel.schema import arrow_schema, to_arrow_table, write_parquet
+
+
+def test_out_of_range_values_become_null_with_warning(tmp_path, capsys):
+    rows = [
+        {'id': 'a', 'media_type': 'image', 'width': 70000, 'height': 120, 'fps': 'abc', 'extra': 1},
+        {'id': 'b', 'media_type': 'video', 'width': 640, 'frame_count': -1, 'shot_changes': 3.0, 'extra': 'x'},
+        {'id': 'c', 'media_type': 'video', 'frame_count': float('inf'), 'duration_sec': 1e40, 'cuts': 2.5, 'extra': {'k': 1}},
+        {'id': 'd', 'media_type': 'video', 'frame_count': 2**40, 'video_embedding': [0.0] * 3},
+    ]
+    table = to_arrow_table(rows)
+    out = capsys.readouterr().out
+    for col in ('width', 'fps', 'frame_count', 'duration_sec', 'cuts', 'video_embedding', 'extra'):
+        assert col in out
+
+    d = table.to_pydict()
+    assert d['width'] == [None, 640, None, None]
+    assert d['height'] == [120, None, None, None]
+    assert d['frame_count'] == [None, None, None, None]
+    assert d['shot_changes'] == [None, 3, None, None]
+    assert d['fps'][0] is None and d['duration_sec'][2] is None and d['cuts'][2] is None
+    assert d['video_embedding'] == [None] * 4
+    assert d['extra'] == ['1', 'x', "{'k': 1}", None]
+    assert table.schema.field('width').type == pa.uint16()
+    assert table.schema.equals(arrow_schema({'extra': pa.string()}))
+
+    write_parquet(table, tmp_path / 'out.parquet')
+    assert pq.read_table(tmp_path / 'out.parquet').num_rows == 4
+
+
+def test_in_range_values_are_kept_exactly(capsys):
+    rows = [{'id': 'a', 'media_type': 'video', 'width': 65535, 'frame_count': 2**32 - 1, 'fps': 29.97, 'extra': 0.5}]
+    d = to_arrow_table(rows).to_pydict()
+    assert capsys.readouterr().out == ''
+    assert d['width'] == [65535] and d['frame_count'] == [2**32 - 1]
+    assert math.isclose(d['fps'][0], 29.97, rel_tol=1e-6) and d['extra'] == [0.5]
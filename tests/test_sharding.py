@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ad_intel.sharding import MergeError, merge_parts, partition_items, write_part
+from ad_intel.schema import to_arrow_table
+
+from .conftest import run_cli
+
+
+def _read(path: Path) -> pd.DataFrame:
+    return pd.read_parquet(path).sort_values('id').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('balance', ['size', 'hash'])
+def test_sharded_then_merged_equals_unsharded(media_dir, tmp_path, balance):
+    common = ['--input', str(media_dir), '--format', 'parquet', '--workers', '1', '--no-adaptive',
+              '--manifest', str(tmp_path / 'manifest.json')]
+    run_cli(*common, '--output', str(tmp_path / 'full.parquet'), cwd=tmp_path)
+    for k in range(3):
+        run_cli(*common, '--output', str(tmp_path / 'parts'), '--shard-index', str(k), '--shard-count', '3',
+                '--shard-balance', balance, cwd=tmp_path)
+    run_cli('merge', '--parts', str(tmp_path / 'parts'), '--output', str(tmp_path / 'merged.parquet'), cwd=tmp_path)
+
+    full, merged = _read(tmp_path / 'full.parquet'), _read(tmp_path / 'merged.parquet')
+    assert len(full) == 7
+    assert 'error' not in full or full['error'].isna().all()
+    pd.testing.assert_frame_equal(full, merged[full.columns])
+
+
+def test_duplicate_ids_are_named_with_their_paths():
+    items = [{'id': 'x/ad1', 'path': 'x/ad1.png'}, {'id': 'x/ad1', 'path': 'x/ad1.mp4'}, {'id': 'y', 'path': 'y.png'}]
+    with pytest.raises(ValueError, match=r'x/ad1 <- x/ad1\.png, x/ad1\.mp4'):
+        partition_items(items, 2)
+
+
+def test_merge_names_ids_duplicated_in_the_manifest(tmp_path):
+    # Parts written by an older planner that let a duplicate id through
+    rows = [{'id': 'x/ad1', 'media_type': 'image'}, {'id': 'y', 'media_type': 'image'}]
+    all_ids = ['x/ad1', 'x/ad1', 'y']
+    write_part(to_arrow_table(rows[:1]), tmp_path, 0, 2, ['x/ad1'], all_ids)
+    write_part(to_arrow_table(rows), tmp_path, 1, 2, ['x/ad1', 'y'], all_ids)
+    with pytest.raises(MergeError, match=r'duplicate_manifest_ids=\[x/ad1\]'):
+        merge_parts(tmp_path, tmp_path / 'out.parquet')
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from ad_intel.extractors.video_basic import extract_video_features, extract_video_segment, merge_video_segments, plan_video_segments
+from ad_intel.frame_ring import extract_videos_pipelined
+from ad_intel.pipeline import process_paths_parallel
+from ad_intel.video_embedding import sample_video_frames
+
+from .conftest import write_video
+
+FI, MF = 0.25, 120
+
+
+def test_video_pass_returns_the_frames_the_embedder_would_decode(tmp_path):
+    path = write_video(tmp_path / 'cuts.mp4', frames=48, cuts=3)
+    frames, _, shots = sample_video_frames(path, FI, MF)
+    assert shots.max() > 0
+
+    whole = extract_video_features(path, FI, MF, embed_crop=224)
+    np.testing.assert_array_equal(whole['_embed_frames'], frames)
+    np.testing.assert_array_equal(whole['_embed_shots'], shots)
+    assert '_embed_frames' not in extract_video_features(path, FI, MF)
+
+    plan = plan_video_segments(path, FI, MF, segment_sec=1.0)
+    assert len(plan['segments']) > 2
+    parts = [extract_video_segment(path, FI, spec, embed_crop=224) for spec in plan['segments']]
+    merged = merge_video_segments(plan['header'], parts)
+    np.testing.assert_array_equal(merged['_embed_frames'], frames)
+    np.testing.assert_array_equal(merged['_embed_shots'], shots)
+
+    ring = extract_videos_pipelined([{'id': 'v', 'path': str(path), 'media_type': 'video'}], FI, MF, embed_crop=224)
+    np.testing.assert_array_equal(ring[0]['_embed_frames'], frames)
+    np.testing.assert_array_equal(ring[0]['_embed_shots'], shots)
+
+
+def test_pool_hands_frames_to_on_result_and_drops_them_from_rows(media_dir):
+    items = [{'id': p.stem, 'path': str(p), 'media_type': 'video' if p.suffix == '.mp4' else 'image'}
+             for p in sorted(media_dir.rglob('*.*'))]
+    seen = {}
+
+    def take(row):
+        if '_embed_frames' in row:
+            seen[row['id']] = row.pop('_embed_frames')
+
+    rows = process_paths_parallel(items, 1, FI, MF, embed_crop=224, on_result=take)
+    assert sorted(seen) == ['v0001', 'v0002']
+    assert all(f.shape[1:] == (224, 224, 3) and len(f) > 0 for f in seen.values())
+    assert len(rows) == len(items)
+    assert not any(k.startswith('_embed') for r in rows for k in r)
+
+
+def test_embedding_width_matches_the_schema(tmp_path, monkeypatch):
+    pytest.importorskip('torch')
+    import torchvision.models as models
+
+    from ad_intel.schema import backbone_embedding_dims, to_arrow_table
+    from ad_intel.video_embedding import VideoEmbedder, merge_embeddings
+
+    # Same architecture without downloading the pretrained weights
+    resnet50 = models.resnet50
+    monkeypatch.setattr(models, 'resnet50', lambda pretrained=True: resnet50(weights=None))
+    embedder = VideoEmbedder('resnet50', batch_size=8, per_shot=True)
+    assert embedder.dim == 2048
+
+    path = write_video(tmp_path / 'cuts.mp4', frames=48, cuts=3)
+    row = {'id': 'v', 'media_type': 'video', **extract_video_features(path, FI, MF, embed_crop=embedder.crop)}
+    embedder.add(row, frame_interval=FI)
+    rows = merge_embeddings([row], embedder.finish())
+    assert len(rows[0]['video_embedding']) == embedder.dim
+
+    table = to_arrow_table(rows, backbone_embedding_dims(embedder.dim))
+    for name in ('video_embedding', 'video_embedding_max', 'video_embedding_early'):
+        assert table.schema.field(name).type.list_size == embedder.dim
+        assert table.column(name).null_count == 0
+    assert table.schema.field('shot_embeddings').type.value_type.list_size == embedder.dim
@@ -0,0 +1,53 @@
+import os
+import time
+
+from ad_intel.workers import PersistentPool, PoolLimits, SupervisedPool, TaskFailure
+
+
+def _task(kind: str, value: int) -> int:
+    if kind == 'crash':
+        os._exit(1)
+    if kind == 'hang':
+        time.sleep(60)
+    if kind == 'raise':
+        raise ValueError('bad item')
+    return value * 2
+
+
+def test_failures_become_rows_and_other_results_survive():
+    args = [('ok', 1), ('crash', 2), ('ok', 3), ('hang', 4), ('raise', 5), ('ok', 6)]
+    pool = SupervisedPool(_task, workers=2, limits=PoolLimits(item_timeout=1.0, poll_interval=0.1))
+    t0 = time.monotonic()
+    res = pool.map(args)
+    assert time.monotonic() - t0 < 30
+    assert sorted(res) == list(range(len(args)))
+    assert res[0] == 2 and res[2] == 6 and res[5] == 12
+    assert res[1] == TaskFailure('worker_died')
+    assert res[3] == TaskFailure('timeout')
+    assert res[4] == TaskFailure('bad item')
+    assert pool.replaced == 2
+
+
+def test_recycling_keeps_results():
+    pool = SupervisedPool(_task, workers=1, limits=PoolLimits(max_tasks_per_worker=2, poll_interval=0.1))
+    res = pool.map([('ok', i) for i in range(5)])
+    assert res == {i: 2 * i for i in range(5)}
+    assert pool.recycled >= 2
+
+
+def test_supervisor_error_fails_futures_and_marks_pool(monkeypatch):
+    pool = PersistentPool(_task, workers=1, limits=PoolLimits(poll_interval=0.1))
+
+    def broken(*args):
+        raise RuntimeError('pipe exploded')
+
+    monkeypatch.setattr(pool, '_step', broken)
+    try:
+        pool.start()
+        fut = pool.submit('ok', 1)
+        assert fut.result(timeout=10) == TaskFailure("pool_failed: RuntimeError('pipe exploded')")
+        assert pool.error == "RuntimeError('pipe exploded')"
+        # Later submissions fail at once instead of waiting on a dead supervisor
+        assert isinstance(pool.submit('ok', 2).result(timeout=1), TaskFailure)
+    finally:
+        pool.shutdown()